@@ -1,37 +1,6 @@
 import os
 import sys
 
-# ==========================================
-# ☢️ NUCLEAR CLOUD FIX: FORCE POLICY.XML
-# ==========================================
-# This creates the security file in the server's TEMP folder 
-# so ImageMagick GUARANTEES it can find it.
-if os.name == 'posix':  # Only runs on Linux (Streamlit Cloud)
-    print("☁️ DETECTED CLOUD ENVIRONMENT: Applying Security Patch...")
-    try:
-        # 1. Define the lenient policy
-        policy_content = """
-        <policymap>
-          <policy domain="path" rights="read|write" pattern="@*" />
-          <policy domain="coder" rights="read|write" pattern="LABEL" />
-          <policy domain="coder" rights="read|write" pattern="CAPTION" />
-          <policy domain="coder" rights="read|write" pattern="TEXT" />
-          <policy domain="resource" name="memory" value="256MiB"/>
-          <policy domain="resource" name="map" value="512MiB"/>
-        </policymap>
-        """
-        # 2. Write it to the temporary system folder
-        with open("/tmp/policy.xml", "w") as f:
-            f.write(policy_content)
-        
-        # 3. Force ImageMagick to look in /tmp
-        os.environ['MAGICK_CONFIGURE_PATH'] = "/tmp"
-        print("✅ SECURITY PATCH APPLIED: policy.xml written to /tmp")
-        
-    except Exception as e:
-        print(f"⚠️ PATCH FAILED: {e}")
-# ==========================================
-
 import PIL.Image
 # FIX FOR PILLOW 10+
 if not hasattr(PIL.Image, 'ANTIALIAS'):
@@ -42,15 +11,18 @@ import json
 import time
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.config import Config
 from src.modules.brain import Brain
-from src.modules.voice import VoiceEngine
 from src.modules.assets import AssetEngine
 from src.modules.editor import VideoEditor
+from src.modules.library import LocalLibrary
+from src.modules.pipeline import Pipeline, ProductionPlan
+from src.modules.routing import ProviderRouter
 from src.modules.utils import clean_temp_folder
 
 # --- CONFIGURATION ---
@@ -75,6 +47,95 @@ def save_to_history(entry):
         json.dump(history, f, indent=4)
     return history
 
+# --- HELPER: BACKGROUND RENDER WORKER ---
+@st.cache_resource
+def get_render_executor():
+    """One background worker (shared across reruns) for full-quality renders."""
+    return ThreadPoolExecutor(max_workers=1)
+
+@st.cache_resource
+def get_render_jobs():
+    """Final renders still reading from the shared TEMP_DIR (across reruns and sessions)."""
+    return set()
+
+def submit_final_render(blueprint, assets):
+    """Queues the full quality export. Its assets stay in TEMP_DIR until it finishes."""
+    job = get_render_executor().submit(VideoEditor.assemble_video, blueprint, {**assets, "render_profile": "final"})
+    get_render_jobs().add(job)
+    job.add_done_callback(get_render_jobs().discard)
+    return job
+
+def show_production(production):
+    """
+    Results of the last launch (kept in session state, so widget clicks don't lose
+    the background export): preview until the final cut is done, then the final cut.
+    """
+    blueprint, title, final_job = production['blueprint'], production['title'], production['final_job']
+    st.success(f"**{title}**")
+    video_slot = st.empty()
+    download_slot = st.empty()
+    if production['preview']:
+        video_slot.video(production['preview'])
+        download_slot.caption("⏳ Draft preview (540p). Full quality export in progress...")
+
+    # CONTENT INTELLIGENCE
+    with st.expander("📈 Viral Marketing & Thumbnails", expanded=True):
+        m_data = blueprint.get('marketing', {})
+        mc1, mc2 = st.columns(2)
+
+        with mc1:
+            st.markdown("**🔥 Viral Titles:**")
+            for t in m_data.get('ctr_titles', []): st.info(f"• {t}")
+            st.markdown("**🏷️ SEO Tags:**")
+            st.code(", ".join(m_data.get('seo_tags', [])), language="text")
+            st.markdown("**📝 Description:**")
+            st.text_area("Copy:", m_data.get('seo_description', "N/A"), height=100)
+
+        with mc2:
+            st.markdown("**🎨 AI Thumbnail Generator**")
+            thumb_ideas = m_data.get('thumbnail_ideas', ["Futuristic Concept"])
+            selected_idea = st.selectbox("Choose Concept:", thumb_ideas)
+
+            if st.button("✨ GENERATE THUMBNAIL"):
+                with st.spinner("🎨 AI is painting..."):
+                    thumb_path = AssetEngine.generate_ai_image(selected_idea, "thumbnail_final.jpg")
+                    if thumb_path:
+                        st.image(thumb_path)
+                        with open(thumb_path, "rb") as file:
+                            st.download_button("⬇️ Download JPG", file, file_name="thumbnail.jpg", mime="image/jpeg")
+                    else:
+                        st.error("Thumbnail generation failed.")
+
+    # FINAL CUT: swap the preview for the full quality export
+    with st.spinner("🎬 Rendering full quality export..."):
+        try:
+            final_video = final_job.result() if final_job else None
+        except Exception as e:
+            print(f"❌ Final render failed: {e}")
+            final_video = None
+
+    if not final_video or not os.path.exists(final_video):
+        download_slot.empty()
+        st.error("❌ Full quality export failed. The draft preview above is kept.")
+        return
+
+    video_slot.video(final_video)
+    with open(final_video, "rb") as f:
+        download_slot.download_button("⬇️ Download Final Video", f, file_name=f"{title}.mp4", use_container_width=True)
+
+    if not production['saved']:
+        production['saved'] = True
+        st.balloons()
+        # SAVE HISTORY
+        save_to_history({
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "topic": production['topic'],
+            "title": title,
+            "path": final_video,
+            "language": production['language'],
+            "marketing": blueprint.get('marketing', {})
+        })
+
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
     page_title="AURA 4.6 | Platinum Studio",
@@ -83,6 +144,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Local library index refresh (once per server process, in the background)
+LocalLibrary.start_indexing()
+
 # Initialize Session State
 if 'page' not in st.session_state: st.session_state.page = "Generate"
 if 'theme' not in st.session_state: st.session_state.theme = "Dark"
@@ -197,6 +261,9 @@ if selected_tab == "🚀 Generate":
             st.divider()
             st.subheader("2. Vibe & Branding")
             music = st.selectbox("🎵 Music Mood", ["Chill", "Upbeat", "Dramatic", "Phonk", "Corporate"])
+            render_engine = st.selectbox("⚙️ Render Engine",
+                ["Classic (MoviePy)", "Parallel Scenes (MoviePy)", "Native (FFmpeg)"],
+                help="Parallel Scenes encodes every scene on its own CPU core. Native skips Python frame processing entirely.")
             
             branding_enabled = st.checkbox("Apply Watermark", value=True)
             watermark_text = ""
@@ -211,6 +278,8 @@ if selected_tab == "🚀 Generate":
                         f.write(logo_file.getbuffer())
             
             st.divider()
+            fresh_script = st.checkbox("🔄 Fresh Script", value=False,
+                                       help="Ask the AI for a new script even if these exact settings were generated before.")
             generate_btn = st.button("🚀 LAUNCH PRODUCTION", use_container_width=True)
 
     with col_output:
@@ -221,119 +290,120 @@ if selected_tab == "🚀 Generate":
             
             try:
                 # PHASE 0: PREP
+                # A final render still running reads its assets from TEMP_DIR: let it finish first
+                running = [job for job in list(get_render_jobs()) if not job.done()]
+                if running:
+                    status.write("⏳ Waiting for the previous full quality export to finish...")
+                    wait(running)
+                st.session_state.pop('production', None)
                 clean_temp_folder(Config.TEMP_DIR)
                 
-                # PHASE 1: BRAIN
+                # PHASE 1: BRAIN (streams into the asset DAG below)
                 status.write(f"🧠 **Brain:** Drafting '{structure}' script for {audience}...")
                 brain = Brain(euri_key_override=st.session_state.euri_key_session)
                 
-                blueprint = brain.generate_video_blueprint(
-                    topic=topic, 
-                    language=language, 
-                    structure=structure,
-                    duration=duration,
-                    audience=audience,
-                    style=style
-                )
-                
-                if not blueprint:
-                    status.update(label="❌ Brain Failure", state="error")
-                    st.stop()
-                
-                title = blueprint['upload_metadata']['title']
-                status.write(f"✅ Strategy Locked: *{title}*")
+                def generate_blueprint(on_section):
+                    return brain.generate_video_blueprint(
+                        topic=topic, 
+                        language=language, 
+                        structure=structure,
+                        duration=duration,
+                        audience=audience,
+                        style=style,
+                        fresh=fresh_script,
+                        on_section=on_section
+                    )
 
-                # PHASE 2: AUDIO
-                status.write(f"🎙️ **Audio:** Synthesizing {language} neural voice...")
-                script_text = blueprint['script']['full_voiceover']
+                # PHASE 2 + 3: AUDIO & VISUALS (one DAG: each scene's download starts as soon as the Brain writes it)
                 audio_path = os.path.join(Config.TEMP_DIR, "voice.mp3")
-                
                 target_voice = language if language != "English" else voice
-                VoiceEngine.generate_audio(script_text, audio_path, voice_name=target_voice)
-                status.write("✅ Audio Mastered")
-
-                # PHASE 3: VISUALS (UPDATED FOR AI MODE)
-                scenes = blueprint['scenes']
                 
                 # Display which mode is active
                 mode_label = "AI Artists" if use_ai_images else "Stock Footage"
+                status.write(f"🎙️ **Audio:** Synthesizing {language} neural voice...")
                 status.write(f"👁️ **Vision:** Scouting assets via **{mode_label}**...")
                 
-                # PASS THE TOGGLE VALUE HERE
-                video_paths = AssetEngine.download_scene_assets(scenes, use_ai_images=use_ai_images)
-                
-                status.write(f"✅ Assets Ready ({len(video_paths)} clips)")
-
-                # PHASE 4: EDITING
-                status.write(f"🎬 **Editor:** Mixing tracks (Music: {music})...")
-                
                 safe_logo_path = None
                 if logo_path and os.path.exists(logo_path):
                     safe_logo_path = logo_path
                 
-                assets = {
-                    "audio_path": audio_path,
-                    "video_paths": video_paths,
+                base_assets = {
                     "music_mood": music,
                     "watermark_text": watermark_text,
-                    "logo_path": safe_logo_path
+                    "logo_path": safe_logo_path,
+                    "render_mode": "segmented" if render_engine.startswith("Parallel") else "single",
+                    "render_backend": "ffmpeg" if render_engine.startswith("Native") else "moviepy"
                 }
-                
-                final_video = VideoEditor.assemble_video(blueprint, assets)
-                
-                status.update(label="✅ Production Complete!", state="complete", expanded=False)
-                
-                st.balloons()
-                st.success(f"**{title}**")
-                st.video(final_video)
-                
-                with open(final_video, "rb") as f:
-                    st.download_button("⬇️ Download Final Video", f, file_name=f"{title}.mp4", use_container_width=True)
-                
-                # CONTENT INTELLIGENCE
-                with st.expander("📈 Viral Marketing & Thumbnails", expanded=True):
-                    m_data = blueprint.get('marketing', {})
-                    mc1, mc2 = st.columns(2)
-                    
-                    with mc1:
-                        st.markdown("**🔥 Viral Titles:**")
-                        for t in m_data.get('ctr_titles', []): st.info(f"• {t}")
-                        st.markdown("**🏷️ SEO Tags:**")
-                        st.code(", ".join(m_data.get('seo_tags', [])), language="text")
-                        st.markdown("**📝 Description:**")
-                        st.text_area("Copy:", m_data.get('seo_description', "N/A"), height=100)
-
-                    with mc2:
-                        st.markdown("**🎨 AI Thumbnail Generator**")
-                        thumb_ideas = m_data.get('thumbnail_ideas', ["Futuristic Concept"])
-                        selected_idea = st.selectbox("Choose Concept:", thumb_ideas)
-                        
-                        if st.button("✨ GENERATE THUMBNAIL"):
-                            with st.spinner("🎨 AI is painting..."):
-                                thumb_path = AssetEngine.generate_ai_image(selected_idea, "thumbnail_final.jpg")
-                                if thumb_path:
-                                    st.image(thumb_path)
-                                    with open(thumb_path, "rb") as file:
-                                        st.download_button("⬇️ Download JPG", file, file_name="thumbnail.jpg", mime="image/jpeg")
-                                else:
-                                    st.error("Thumbnail generation failed.")
-
-                # SAVE HISTORY
-                entry = {
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+
+                def build_assets(voice_result, video_paths):
+                    return {
+                        **base_assets,
+                        "audio_path": voice_result['audio_path'],
+                        "video_paths": video_paths,
+                        "scene_durations": voice_result['scene_durations'],
+                        "word_timings": voice_result['word_timings']
+                    }
+
+                def on_stage(event, name, seconds):
+                    # Runs on the script thread (Pipeline.run), so Streamlit calls are safe here
+                    if event == "done" and name == "blueprint":
+                        title = pipeline.results['blueprint'].get('upload_metadata', {}).get('title', 'Untitled')
+                        status.write(f"✅ Strategy Locked: *{title}* ({seconds:.1f}s)")
+                    elif event == "start" and name.startswith("fetch:"):
+                        status.write(f"🔎 Scene {name.split(':', 1)[1]} scripted, scouting...")
+                    elif event == "done" and name == "voice":
+                        status.write(f"✅ Audio Mastered ({seconds:.1f}s)")
+                    elif event == "done" and name == "assets":
+                        status.write(f"✅ Assets Ready ({len(pipeline.results['assets'])} clips)")
+                        status.write(f"🎬 **Editor:** Mixing tracks (Music: {music})...")
+                        # Fast 540p draft first so the monitor shows something in seconds
+                        status.write("⚡ **Preview:** Rendering draft cut...")
+                    elif event == "done" and name == "final":
+                        status.write("🎬 **Export:** Full quality render started alongside the preview...")
+                    elif event == "done" and name.startswith("normalize:"):
+                        status.write(f"🎞️ Scene {name.split(':', 1)[1]} ready ({seconds:.1f}s conform)")
+                    elif event == "failed":
+                        status.write(f"⚠️ Stage failed: {name}")
+
+                pipeline = Pipeline(on_event=on_stage)
+                blueprint_stage, voice_stage, assets_stage = ProductionPlan.add_streaming_stages(
+                    pipeline, generate_blueprint, audio_path, voice_name=target_voice, use_ai_images=use_ai_images
+                )
+                pipeline.add("assets_map", build_assets, after=[voice_stage, assets_stage])
+                # Full quality export starts as soon as its inputs exist, next to the preview
+                pipeline.add("final", submit_final_render, after=[blueprint_stage, "assets_map"])
+                pipeline.add("preview", lambda blueprint, assets: VideoEditor.assemble_video(
+                    blueprint, {**assets, "render_profile": "preview"}), after=[blueprint_stage, "assets_map"])
+                pipeline.run()
+                pipeline.report()
+
+                if blueprint_stage in pipeline.failed:
+                    status.update(label="❌ Brain Failure", state="error")
+                    st.stop()
+                if voice_stage in pipeline.failed:
+                    status.update(label="❌ Voice Failure", state="error")
+                    st.stop()
+
+                blueprint = pipeline.results[blueprint_stage]
+                st.session_state.production = {
+                    "blueprint": blueprint,
+                    "title": blueprint.get('upload_metadata', {}).get('title', 'Untitled'),
                     "topic": topic,
-                    "title": title,
-                    "path": final_video,
                     "language": language,
-                    "marketing": blueprint.get('marketing', {})
+                    "preview": pipeline.results.get("preview"),
+                    "final_job": pipeline.results.get("final"),
+                    "saved": False,
                 }
-                save_to_history(entry)
+                status.update(label="⚡ Preview Ready! Rendering final cut...", state="complete", expanded=False)
 
             except Exception as e:
                 status.update(label="❌ Critical System Error", state="error")
                 st.error(f"Error Log: {e}")
+                st.stop()
 
-        else:
+        if st.session_state.get('production'):
+            show_production(st.session_state.production)
+        elif not (generate_btn and topic):
             st.info("👈 System Standby. Enter a topic to begin.")
             st.markdown("""
                 <div style="padding: 20px; border-radius: 10px; border: 1px dashed #6c757d; text-align: center;">
@@ -416,4 +486,13 @@ elif selected_tab == "📊 Dashboard":
     st.markdown("### 📅 Recent Activity")
     if history_data:
         df = pd.DataFrame(history_data)[["timestamp", "title", "language"]]
-        st.dataframe(df, use_container_width=True, hide_index=True)
\ No newline at end of file
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+    st.markdown("### 🧭 Provider Routing")
+    routing = ProviderRouter.metrics()
+    if routing['providers']:
+        rows = [{"provider": name, **stats, **routing['decisions'].get(name, {})}
+                for name, stats in routing['providers'].items()]
+        st.dataframe(pd.DataFrame(rows).fillna(0), use_container_width=True, hide_index=True)
+    else:
+        st.caption("No provider calls in this session yet.")
\ No newline at end of file
@@ -44,12 +44,124 @@ class Config:
     
     DATA_DIR = os.path.join(BASE_DIR, "data")
     OUTPUT_DIR = os.path.join(DATA_DIR, "output")
+
+    # 🗄️ PERSISTENT CACHES (survive clean_temp_folder)
+    CACHE_DIR = os.path.join(DATA_DIR, "cache")
+    RENDER_CACHE_DIR = os.path.join(CACHE_DIR, "render")
+    RENDER_CACHE_MAX_MB = 2048
+    TTS_CACHE_DIR = os.path.join(CACHE_DIR, "tts")
+    TTS_CACHE_MAX_MB = 256
+    MEDIA_CACHE_DIR = os.path.join(CACHE_DIR, "media")   # Stock clips + AI images
+    MEDIA_CACHE_MAX_MB = 4096
+    SEARCH_CACHE_DIR = os.path.join(CACHE_DIR, "search")  # Stock search API answers
+    SEARCH_CACHE_MAX_MB = 64
+    BLUEPRINT_CACHE_DIR = os.path.join(CACHE_DIR, "blueprints")  # LLM blueprints (+ raw replies for debugging)
+    BLUEPRINT_CACHE_MAX_MB = 32
+    BLUEPRINT_CACHE_TTL = 7 * 24 * 3600   # Seconds before the same request is sent to the LLM again
     
     # 🎥 VIDEO STANDARDS
     VIDEO_WIDTH = 1080
     VIDEO_HEIGHT = 1920
     FPS = 30 # 30 is safer for Cloud rendering than 60
-    
+
+    # 🎚️ RENDER PROFILES
+    # "final" = full quality export, "preview" = fast draft shown while the final renders
+    RENDER_PROFILE = "final"
+    RENDER_PROFILES = {
+        "final": {
+            "width": VIDEO_WIDTH, "height": VIDEO_HEIGHT, "fps": FPS,
+            "crf": None, "audio_fps": 44100, "audio_bitrate": "192k",
+            "fast_captions": False,
+        },
+        "preview": {
+            "width": 540, "height": 960, "fps": 15,
+            "crf": 30, "audio_fps": 22050, "audio_bitrate": "64k",
+            "fast_captions": True,  # No stroke pass on captions
+        },
+    }
+
+    # 🎞️ RENDER ENGINE
+    # "single" = one MoviePy pass, "segmented" = parallel per-scene encode + stream-copy concat
+    RENDER_MODE = os.getenv("AURA_RENDER_MODE", "single")
+    RENDER_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+    # "moviepy" (default, fallback) or "ffmpeg" (single native filtergraph)
+    RENDER_BACKEND = os.getenv("AURA_RENDER_BACKEND", "moviepy")
+
+    # 📚 LOCAL STOCK LIBRARY (searched before Pexels; skipped if the folder doesn't exist)
+    LIBRARY_DIR = os.getenv("AURA_LIBRARY_DIR", os.path.join(ASSETS_DIR, "library"))
+    LIBRARY_INDEX_PATH = os.path.join(CACHE_DIR, "library_index.json")
+    LIBRARY_THUMB_DIR = os.path.join(CACHE_DIR, "library_thumbs")
+
+    # 🧵 PIPELINE (voice, downloads and normalization run side by side)
+    PIPELINE_WORKERS = 6
+
+    # 🌐 HTTP (shared pooled client for every outbound call)
+    HTTP_POOL_HOSTS = 8                         # Distinct hosts kept alive
+    HTTP_POOL_SIZE = max(PIPELINE_WORKERS, 4)   # Keep-alive connections per host (one per worker)
+    HTTP_MAX_PER_HOST = 4                       # Concurrent requests per host
+    HTTP_HOST_LIMITS = {                        # Per-host overrides
+        "image.pollinations.ai": 2,             # Free tier: queues (and slows) parallel generations
+    }
+    HTTP_TIMEOUT = (5, 30)                      # (connect, read) seconds
+    HTTP_RETRIES = 3
+    HTTP_BACKOFF = 0.5                          # First retry waits ~0.5s, doubling after
+    HTTP_BACKOFF_MAX = 8
+    HTTP_RETRY_AFTER_MAX = 30                   # Give up instead of honoring longer Retry-After waits
+    LLM_TIMEOUT = (5, 120)                      # Blueprint generation can take a while
+
+    # 📷 PEXELS QUOTA
+    PEXELS_SEARCH_TTL = 24 * 3600   # Seconds a cached search result stays fresh
+    PEXELS_SPREAD_BELOW = 50        # Start pacing searches when fewer calls than this remain
+    PEXELS_MAX_QUOTA_WAIT = 10.0    # Longest a search may be deferred before it's skipped
+    PEXELS_MAX_PER_PAGE = 15        # Largest batch one clustered search asks for
+    QUERY_CLUSTER_SIMILARITY = 0.5  # Token overlap at which two scene queries share a search
+    PARTIAL_DOWNLOADS = True        # Fetch only the leading seconds of stock clips a scene can use
+
+    # 📦 ASSET ENGINE
+    ASSET_CONCURRENCY = 4     # Scenes fetched at once
+    ASSET_WORKERS = 8         # Threads behind them (spares cover downloads abandoned at their deadline)
+    ASSET_DEADLINE = 120.0    # Seconds a scene may take (fetch + conform) before it's rendered as a placeholder
+
+    # 🏁 AI IMAGE HEDGING (Euron primary, Pollinations raced in when Euron runs slow)
+    AI_IMAGE_HEDGING = True
+    HEDGE_PERCENTILE = 0.9        # Hedge once the primary is slower than its recent p90
+    HEDGE_DEFAULT_DELAY = 8.0     # Used until enough latencies have been seen
+    HEDGE_MIN_DELAY = 1.0
+    HEDGE_WORKERS = 8
+    PROVIDER_STATS_WINDOW = 50    # Recent calls kept per provider
+    PROVIDER_MIN_SAMPLES = 5
+    BREAKER_FAILURES = 3          # Failures in a row that open a provider's circuit breaker
+    BREAKER_COOLDOWN = 60.0       # Seconds before a half-open trial call
+
+    # 🧭 LLM ROUTING (Brain: fastest healthy engine first, backup raced in when the first stays silent)
+    LLM_HEDGE_PERCENTILE = 0.95   # Race the backup once the primary's first token is later than its p95
+    LLM_HEDGE_DEFAULT_DELAY = 15.0   # Used until enough first-token times have been seen
+    LLM_MAX_OUTPUT_TOKENS = 3000     # Reserved per call in the tokens-per-minute budget (refunded after)
+    LLM_RATE_LIMITS = {              # Client-side requests/tokens per minute, per engine
+        "OpenAI": {"rpm": 500, "tpm": 30000},
+        "Euri AI": {"rpm": 60, "tpm": 60000},
+    }
+
+    # 📅 BATCH BLUEPRINTS (content calendars)
+    BATCH_WORKERS = 4
+    BATCH_DIR = os.path.join(DATA_DIR, "batches")   # Resumable JSONL results
+
+    # 📐 INGEST NORMALIZATION (1080x1920 @ FPS proxies, made right after download)
+    NORMALIZE_ASSETS = True
+    PROXY_GOP = 15         # Keyframe every 0.5s for cheap seeking
+    PROXY_HEADROOM = 2.0   # Extra seconds kept beyond the scene's duration_estimate
+    PROXY_MIN_SECONDS = 12.0   # Never trim proxies shorter than this
+
+    # 🔍 KEN BURNS (still images)
+    KEN_BURNS_ZOOM_RATE = 0.04     # Zoom gained per second
+    KEN_BURNS_EASING = "linear"    # linear | ease_in | ease_out | ease_in_out
+    KEN_BURNS_PAN = "center"       # center | left | right | up | down
+
+    # 🎙️ VOICE
+    # "full" = one pass over full_voiceover, "scenes" = concurrent per-scene synthesis (speech-accurate cuts)
+    VOICE_MODE = os.getenv("AURA_VOICE_MODE", "full")
+    TTS_CONCURRENCY = 4
+
     # Subtitle Settings (Cloud Safe Font)
     # On Windows, Arial works. On Cloud, DejaVuSans is safer.
     FONT_NAME = os.path.join(FONTS_DIR, "bold.ttf")
@@ -69,6 +181,11 @@ class Config:
         # Ensure Critical Folders Exist
         os.makedirs(cls.TEMP_DIR, exist_ok=True)
         os.makedirs(cls.OUTPUT_DIR, exist_ok=True)
+        os.makedirs(cls.RENDER_CACHE_DIR, exist_ok=True)
+        os.makedirs(cls.TTS_CACHE_DIR, exist_ok=True)
+        os.makedirs(cls.MEDIA_CACHE_DIR, exist_ok=True)
+        os.makedirs(cls.SEARCH_CACHE_DIR, exist_ok=True)
+        os.makedirs(cls.BLUEPRINT_CACHE_DIR, exist_ok=True)
         os.makedirs(cls.MUSIC_DIR, exist_ok=True) # Creates 'music' folder if missing
 
 Config.validate()
\ No newline at end of file
@@ -6,12 +6,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.config import Config
 from src.modules.brain import Brain
-from src.modules.voice import VoiceEngine
-from src.modules.assets import AssetEngine
 from src.modules.editor import VideoEditor
+from src.modules.library import LocalLibrary
+from src.modules.pipeline import Pipeline, ProductionPlan
 from src.modules.utils import clean_temp_folder
 
-def run_aura_pipeline(topic: str):
+def run_aura_pipeline(topic: str, fresh: bool = False):
     print("\n" + "="*60)
     print(f"🚀 AURA 4.1 (MULTI-SCENE): Processing '{topic}'")
     print("="*60 + "\n")
@@ -19,47 +19,44 @@ def run_aura_pipeline(topic: str):
     # 0. Clean up old temporary files (Crucial for multi-scene)
     clean_temp_folder(Config.TEMP_DIR)
     
-    # --- PHASE 1: THE BRAIN ---
+    # --- PHASE 1 + 2 + 3: BRAIN, ASSETS & ASSEMBLY (one DAG) ---
+    # The blueprint streams in: the voice starts once the script is written and
+    # each scene's download/normalize once that scene is, while the model is
+    # still writing the rest. The editor starts when the voice and all assets exist.
+    print("\n📦 PHASE 1+2: BRAIN STREAMING INTO ASSETS (voice + visuals in parallel)")
+    audio_path = os.path.join(Config.TEMP_DIR, "voice_main.mp3")
     brain = Brain()
-    blueprint = brain.generate_video_blueprint(topic)
-    
-    if not blueprint:
-        print("❌ ABORT: Brain failed to generate blueprint.")
-        return
 
-    # Extract Key Data
-    script_text = blueprint.get('script', {}).get('full_voiceover')
-    scenes = blueprint.get('scenes', []) # Grab ALL scenes
-    
-    if not script_text:
-        print("❌ ABORT: Empty script.")
-        return
+    pipeline = Pipeline()
+    blueprint_stage, voice_stage, assets_stage = ProductionPlan.add_streaming_stages(
+        pipeline, lambda on_section: brain.generate_video_blueprint(topic, fresh=fresh, on_section=on_section),
+        audio_path
+    )
 
-    # --- PHASE 2: ASSET PROCUREMENT ---
-    print("\n📦 PHASE 2: GATHERING ASSETS")
-    
-    # 2.1 Voice
-    audio_path = os.path.join(Config.TEMP_DIR, "voice_main.mp3")
-    if not VoiceEngine.generate_audio(script_text, audio_path):
-        print("❌ Voice failed.")
-        return
+    def assemble(blueprint, voice, video_paths):
+        if not video_paths:
+            print("⚠️ Visuals failed. Editor will use Black Screen fallback.")
+        print("\n🎬 PHASE 3: FINAL ASSEMBLY")
+        assets = {
+            "audio_path": voice['audio_path'],
+            "video_paths": video_paths,  # Pass the LIST of videos
+            "scene_durations": voice['scene_durations'],  # Speech-accurate cuts (None = equal split)
+            "word_timings": voice['word_timings']         # Cuts/captions on word boundaries in full-voiceover mode
+        }
+        return VideoEditor.assemble_video(blueprint, assets)
 
-    # 2.2 Visuals (Download Multiple Scenes)
-    # The Asset Engine will loop through the scenes and download a clip for each
-    video_paths = AssetEngine.download_scene_assets(scenes)
+    pipeline.add("render", assemble, after=[blueprint_stage, voice_stage, assets_stage])
+    results = pipeline.run()
+    pipeline.report()
 
-    if not video_paths:
-        print("⚠️ Visuals failed. Editor will use Black Screen fallback.")
+    if blueprint_stage in pipeline.failed:
+        print("❌ ABORT: Brain failed to generate blueprint.")
+        return
+    if voice_stage in pipeline.failed:
+        print("❌ Voice failed.")
+        return
 
-    # --- PHASE 3: PRODUCTION ---
-    print("\n🎬 PHASE 3: FINAL ASSEMBLY")
-    
-    assets = {
-        "audio_path": audio_path,
-        "video_paths": video_paths  # Pass the LIST of videos
-    }
-    
-    final_output = VideoEditor.assemble_video(blueprint, assets)
+    final_output = results.get("render")
     
     if final_output:
         print("\n" + "="*60)
@@ -76,6 +73,8 @@ def run_aura_pipeline(topic: str):
         print("\n❌ MISSION FAILED during rendering.")
 
 if __name__ == "__main__":
+    # Index new library clips while the first topic is typed (never inside a scene fetch)
+    LocalLibrary.start_indexing()
     while True:
         user_input = input("\n💡 Enter Video Topic (or 'q' to quit): ")
         if user_input.lower() == 'q':
@@ -1,45 +1,91 @@
 import os
+import math
 import requests
 import json
 import random
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from src.config import Config
+from src.modules.normalizer import MediaNormalizer
+from src.modules.utils import run_ffmpeg
+from src.modules.network import HttpClient, RateLimitBudget
+from src.modules.routing import hedged_call
+from src.modules.library import LocalLibrary
+from src.modules.planner import AssetPlanner
+from src.modules.cache import MediaCache, JsonCache, hash_payload, place_file
 
 class AssetEngine:
     PEXELS_BASE_URL = "https://api.pexels.com/videos/search"
     EURON_IMAGE_URL = "https://api.euron.one/v1/images/generations"  # Standard OpenAI-compatible endpoint
+    EURON_IMAGE_MODEL = "gemini-3-pro-image-preview"  # The specific model ID you found
+
+    # Downloads + generations survive clean_temp_folder here (LRU, size-capped, checksummed)
+    _media_cache = MediaCache(Config.MEDIA_CACHE_DIR, Config.MEDIA_CACHE_MAX_MB)
+    # Pexels /videos/search answers by normalized query + params, and the hourly quota they spend
+    _search_cache = JsonCache(Config.SEARCH_CACHE_DIR, Config.SEARCH_CACHE_MAX_MB, Config.PEXELS_SEARCH_TTL)
+    _pexels_budget = RateLimitBudget("Pexels", spread_below=Config.PEXELS_SPREAD_BELOW,
+                                     max_wait=Config.PEXELS_MAX_QUOTA_WAIT)
+    _search_locks = {}
+    _search_locks_lock = threading.Lock()
+    
+    # Shared scene workers. Never shut down, so a hung download that missed its
+    # deadline can't hold up the job that abandoned it.
+    _workers = ThreadPoolExecutor(max_workers=Config.ASSET_WORKERS, thread_name_prefix="aura-asset")
+    # Scenes fetching at once (the pipeline may have more scene stages ready than that)
+    scene_slots = threading.BoundedSemaphore(Config.ASSET_CONCURRENCY)
     
     @staticmethod
-    def download_scene_assets(scenes, use_ai_images=False):
+    def run_with_deadline(func, *args, deadline=None):
         """
-        Downloads videos or generates AI images for each scene based on the Toggle Switch.
-        Returns Dictionary: { scene_id: "path/to/file" }
+        Runs func on the scene workers; gives up (returns None) after deadline seconds.
+        The abandoned call keeps its worker until it ends (hence the spare workers).
         """
-        mode_label = "AI ARTIST" if use_ai_images else "STOCK FOOTAGE"
-        print(f"📦 ASSET ENGINE: Fetching {len(scenes)} assets via [{mode_label}]...")
-        
-        asset_map = {}
-        
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            # Pass the 'use_ai_images' flag to the worker
-            future_to_scene = {
-                executor.submit(AssetEngine._process_single_scene, scene, use_ai_images): scene['id'] 
-                for scene in scenes
-            }
-            
-            for future in future_to_scene:
-                scene_id = future_to_scene[future]
-                try:
-                    path = future.result()
-                    if path:
-                        asset_map[scene_id] = path
-                except Exception as e:
-                    print(f"⚠️ Failed to process scene {scene_id}: {e}")
-        
-        return asset_map
+        deadline = Config.ASSET_DEADLINE if deadline is None else deadline
+        future = AssetEngine._workers.submit(func, *args)
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeoutError:
+            print(f"⏰ {getattr(func, '__name__', 'Asset task')} missed its {deadline:g}s deadline.")
+            return None
+
+    @staticmethod
+    def fetch_scene_asset(scene, use_ai_images=False, plan=None, script_seconds=None):
+        """
+        Downloads (or generates) one scene's raw asset. Returns the path or None.
+        plan: this scene's AssetPlanner entry ({"query", "rank", "per_page", "job"}).
+        script_seconds: estimated voiceover length; partial downloads keep that much
+        (the same bound as the proxy, see _proxy_duration).
+        """
+        return AssetEngine._process_single_scene(scene, use_ai_images, plan, script_seconds)
 
     @staticmethod
-    def _process_single_scene(scene, use_ai_images):
+    def normalize_scene_asset(scene, path, script_seconds=None):
+        """
+        Conforms one downloaded asset to a render-ready proxy (original path on failure).
+        script_seconds: estimated length of the whole voiceover (see _proxy_duration).
+        """
+        if not path:
+            return None
+        return MediaNormalizer.normalize(path, AssetEngine._proxy_duration(scene, script_seconds))
+
+    @staticmethod
+    def _proxy_duration(scene, script_seconds=None):
+        """
+        How much of a clip the editor can need. A scene's slice is only known once
+        the voice exists (an equal share of the whole track, or wherever the speech
+        puts its cuts), so the safe bound is the whole script's estimated length;
+        the scene's own estimate when that isn't known.
+        """
+        try:
+            estimate = float(scene.get('duration_estimate') or 0)
+        except (TypeError, ValueError):
+            estimate = 0
+        # Estimates are often short of the real voice timing, so keep headroom and a floor
+        longest = max(estimate, script_seconds or 0)
+        return max(longest + Config.PROXY_HEADROOM, Config.PROXY_MIN_SECONDS)
+
+    @staticmethod
+    def _process_single_scene(scene, use_ai_images, plan=None, script_seconds=None):
         """Decides whether to download video or generate image"""
         scene_id = scene.get('id')
         visual_plan = scene.get('visual', {})
@@ -53,8 +99,23 @@ class AssetEngine:
             return AssetEngine.generate_ai_image(art_prompt, f"scene_{scene_id}.jpg")
 
         # --- PATH B: STOCK VIDEO MODE (Original) ---
-        # 1. First, try to get a Real Video from Pexels
-        video_path = AssetEngine.search_and_download_video(query, f"scene_{scene_id}.mp4")
+        # Scenes in a query cluster share one search and take distinct results (rank)
+        plan = plan or {"query": query, "rank": 0, "per_page": 3}
+        duration = AssetEngine._proxy_duration(scene, script_seconds)
+
+        # 0. Local licensed library first: no network, no quota
+        local_path = AssetEngine.find_local_clip(plan['query'], f"scene_{scene_id}", duration, rank=plan['rank'],
+                                                 plan=plan)
+        if local_path:
+            return local_path
+
+        # 1. Then try to get a Real Video from Pexels
+        video_path = AssetEngine.search_and_download_video(plan['query'], f"scene_{scene_id}.mp4", duration=duration,
+                                                           rank=plan['rank'], per_page=plan['per_page'], plan=plan)
+        if not video_path and plan['query'] != query:
+            # The cluster ran out of distinct results: search this scene's own wording
+            video_path = AssetEngine.search_and_download_video(query, f"scene_{scene_id}.mp4", duration=duration,
+                                                               plan=plan)
         if video_path:
             return video_path
             
@@ -64,95 +125,288 @@ class AssetEngine:
         return AssetEngine.generate_ai_image(fallback_prompt, f"scene_{scene_id}.jpg")
 
     @staticmethod
-    def search_and_download_video(query, filename):
-        """Downloads a SINGLE video from Pexels."""
+    def find_local_clip(query, stem, duration=None, rank=0, plan=None):
+        """
+        Links the rank-th best local library match into TEMP_DIR as <stem><ext>
+        (or the next one another scene of the plan's job hasn't taken).
+        Returns the path or None.
+        """
+        matches = LocalLibrary.find(query, min_duration=duration or 0, limit=rank + Config.PEXELS_MAX_PER_PAGE)
+        source = next((m for m in matches[rank:] if AssetPlanner.claim(plan, f"library:{m}")), None)
+        if source is None:
+            return None
+        print(f"📚 LOCAL LIBRARY: '{query}' -> {os.path.basename(source)}")
+        # Work on a link in TEMP_DIR so proxies never land inside the library
+        return place_file(source, os.path.join(Config.TEMP_DIR, stem + os.path.splitext(source)[1]))
+
+    @staticmethod
+    def search_and_download_video(query, filename, duration=None, rank=0, per_page=3, plan=None):
+        """
+        Downloads a SINGLE video from Pexels: the rank-th search result, so scenes
+        sharing a query get different clips. Results another scene of the plan's
+        job already took are skipped (distinct clips across clusters too).
+        With a duration, only the leading `duration` seconds are fetched.
+        """
         if not Config.PEXELS_API_KEY: return None
         
-        headers = {"Authorization": Config.PEXELS_API_KEY}
-        params = {"query": query, "orientation": "portrait", "per_page": 3, "size": "medium"}
+        params = {"query": query, "orientation": "portrait", "per_page": per_page, "size": "medium"}
         
         try:
-            r = requests.get(AssetEngine.PEXELS_BASE_URL, headers=headers, params=params, timeout=10)
-            if r.status_code != 200: return None
+            data = AssetEngine._search_pexels(params)
+            if data is None: return None
             
-            data = r.json()
             videos = data.get('videos', [])
+            video = next((v for v in videos[rank:] if AssetPlanner.claim(plan, f"pexels:{v.get('id')}")), None)
+            if video is None: return None
             
-            if videos:
-                # Pick best quality MP4 (HD but not 4K)
-                for video in videos:
-                    for file in video.get("video_files", []):
-                        if file.get("file_type") == "video/mp4" and 700 < file.get("width", 0) < 2000:
-                            return AssetEngine._download_file(file.get("link"), filename)
-                
-                # Fallback to first available if strictly filtered one not found
-                if videos[0].get("video_files"):
-                     return AssetEngine._download_file(videos[0]["video_files"][0].get("link"), filename)
+            file = AssetEngine._pick_rendition([video])
+            if file:
+                if duration:
+                    # A cached full download covers any cut
+                    full = AssetEngine._cached_media(AssetEngine._stock_cache_key(file), filename)
+                    if full:
+                        return full
+                    # 5s buckets (rounded up) so similar scenes share one cached partial clip;
+                    # heads are keyed by length, so a longer cut never gets a shorter head
+                    duration = math.ceil(duration / 5.0) * 5
+                return AssetEngine._download_file(file.get("link"), filename,
+                                                  AssetEngine._stock_cache_key(file, duration), duration)
             return None
         except:
             return None
 
     @staticmethod
-    def _download_file(url, filename):
-        save_path = os.path.join(Config.TEMP_DIR, filename)
+    def _pick_rendition(videos):
+        """
+        Smallest MP4 rendition that still covers the 1080x1920 frame (no upscaling),
+        from the most relevant video that has one. Falls back to the sharpest
+        rendition of the first video.
+        """
+        W, H = Config.VIDEO_WIDTH, Config.VIDEO_HEIGHT
+        fallback = None
+        for video in videos:
+            files = [f for f in video.get("video_files", [])
+                     if f.get("file_type") == "video/mp4" and f.get("width") and f.get("height") and f.get("link")]
+            # Cover-scale <= 1: the editor only ever downscales this rendition
+            covering = [f for f in files if max(W / f["width"], H / f["height"]) <= 1]
+            if covering:
+                return min(covering, key=lambda f: f["width"] * f["height"])
+            if files and fallback is None:
+                fallback = max(files, key=lambda f: f["width"] * f["height"])
+
+        if fallback is None and videos and videos[0].get("video_files"):
+            fallback = videos[0]["video_files"][0]
+        return fallback
+
+    @staticmethod
+    def _search_pexels(params):
+        """
+        /videos/search behind the search cache and the quota budget.
+        Returns the response JSON, or None when there's no answer (live or cached).
+        """
+        # Same words, same params -> same results ("City  Night" == "city night")
+        normalized = dict(params, query=" ".join(str(params['query']).lower().split()))
+        cache_key = hash_payload({"endpoint": "pexels/videos/search", **normalized})
+
+        # Single flight: scenes of one cluster wait for the first search instead of repeating it
+        with AssetEngine._search_locks_lock:
+            search_lock = AssetEngine._search_locks.setdefault(cache_key, threading.Lock())
+        with search_lock:
+            return AssetEngine._search_pexels_locked(normalized, cache_key)
+
+    @staticmethod
+    def _search_pexels_locked(normalized, cache_key):
+        cached = AssetEngine._search_cache.load(cache_key)
+        if cached is not None:
+            return cached
+
+        # Out of quota, offline or erroring: an expired answer beats falling back to slow AI generation
+        if not AssetEngine._pexels_budget.acquire():
+            return AssetEngine._stale_search(normalized, cache_key)
+
+        headers = {"Authorization": Config.PEXELS_API_KEY}
         try:
-            with requests.get(url, stream=True, timeout=20) as r:
-                r.raise_for_status()
-                with open(save_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
+            r = HttpClient.get(AssetEngine.PEXELS_BASE_URL, headers=headers, params=normalized, timeout=10)
+            AssetEngine._pexels_budget.update(r)
+            if r.status_code != 200:
+                return AssetEngine._stale_search(normalized, cache_key)
+            data = r.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ Pexels search failed for '{normalized['query']}': {e}")
+            return AssetEngine._stale_search(normalized, cache_key)
+
+        AssetEngine._search_cache.store(cache_key, data)
+        return data
+
+    @staticmethod
+    def _stale_search(normalized, cache_key):
+        stale = AssetEngine._search_cache.load(cache_key, allow_stale=True)
+        if stale is not None:
+            print(f"♻️ Using stale Pexels results for '{normalized['query']}'")
+        return stale
+
+    @staticmethod
+    def _download_file(url, filename, cache_key=None, duration=None, cancel=None):
+        """
+        Downloads into TEMP_DIR. With a cache_key the file is served from / stored in
+        the persistent media cache, so it survives clean_temp_folder between jobs.
+        With a duration (videos) only the leading part of the clip is fetched.
+        """
+        save_path = os.path.join(Config.TEMP_DIR, filename)
+        ext = os.path.splitext(filename)[1]
+        if cache_key:
+            cached = AssetEngine._cached_media(cache_key, filename)
+            if cached:
+                return cached
+
+        path = None
+        if duration and Config.PARTIAL_DOWNLOADS:
+            path = AssetEngine._download_head(url, save_path, duration)
+        if not path:
+            path = HttpClient.download(url, save_path, timeout=(5, 20), cancel=cancel)
+        if path and cache_key:
+            AssetEngine._media_cache.put(cache_key, path, ext, source=url)
+        return path
+
+    @staticmethod
+    def _download_head(url, save_path, duration):
+        """
+        Time-limited ffmpeg remux straight from the URL: ffmpeg range-requests
+        only the bytes behind the first `duration` seconds (plus the moov atom)
+        and stream-copies them, so nothing is re-encoded. Returns save_path or None.
+        """
+        base, ext = os.path.splitext(save_path)
+        tmp_path = f"{base}.part{ext}"
+        with HttpClient.host_slot(url):
+            ok = run_ffmpeg([
+                "-rw_timeout", str(20 * 1000000),   # Microseconds; don't hang on a stalled CDN
+                "-i", url,
+                "-t", f"{duration:.3f}",
+                "-map", "0:v:0", "-c", "copy",
+                "-movflags", "+faststart",
+                tmp_path
+            ], label=f"Partial download {os.path.basename(save_path)}")
+
+        if ok and os.path.exists(tmp_path) and os.path.getsize(tmp_path) > 0:
+            os.replace(tmp_path, save_path)
             return save_path
-        except:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return None
+
+    @staticmethod
+    def _cached_media(cache_key, filename):
+        """Links a media cache hit into TEMP_DIR. Returns the workspace path or None."""
+        cached = AssetEngine._media_cache.get(cache_key, os.path.splitext(filename)[1])
+        if not cached:
             return None
+        print(f"♻️ MEDIA CACHE HIT: {filename}")
+        return place_file(cached, os.path.join(Config.TEMP_DIR, filename))
+
+    @staticmethod
+    def _stock_cache_key(video_file, duration=None):
+        """
+        Pexels video files are immutable per ID; the URL is the fallback identity.
+        Partial downloads are keyed by their length.
+        """
+        seconds = round(duration, 3) if duration else None
+        if video_file.get("id"):
+            return hash_payload({"source": "pexels", "file_id": video_file["id"], "seconds": seconds})
+        return hash_payload({"source": "url", "url": video_file.get("link"), "seconds": seconds})
+
+    @staticmethod
+    def _ai_cache_key(provider, model, prompt, size):
+        return hash_payload({"source": provider, "model": model, "prompt": prompt, "size": size})
 
     @staticmethod
     def generate_ai_image(prompt: str, filename: str):
         """
         Generates AI Image using GEMINI 3 PRO (Nano Banana) via Euron.
-        Falls back to Pollinations if Euron fails.
+        Falls back to Pollinations if Euron fails, or (hedged mode) races it
+        when Euron is slower than its recent latency percentile.
         """
         save_path = os.path.join(Config.TEMP_DIR, filename)
+        euron_key = AssetEngine._ai_cache_key("euron", AssetEngine.EURON_IMAGE_MODEL, prompt, "1024x1024")
+        pollinations_key = AssetEngine._ai_cache_key("pollinations", "flux", prompt, "1080x1920")
+
+        # --- CACHE: same prompt + model + size was already generated ---
+        for cache_key in (euron_key, pollinations_key):
+            cached = AssetEngine._cached_media(cache_key, filename)
+            if cached:
+                return cached
         
+        stem, ext = os.path.splitext(filename)
+
         # --- PRIMARY: GEMINI 3 PRO (EURON) ---
-        if Config.EURIAI_API_KEY:
-            # print(f"✨ GEN: Using Gemini 3 Pro for '{prompt[:20]}...'")
-            headers = {
-                "Authorization": f"Bearer {Config.EURIAI_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            # Euron uses standard OpenAI Image Format
-            data = {
-                "model": "gemini-3-pro-image-preview", # The specific model ID you found
-                "prompt": prompt,
-                "n": 1,
-                "size": "1024x1024",
-                "quality": "standard"
-            }
-            
-            try:
-                resp = requests.post(AssetEngine.EURON_IMAGE_URL, headers=headers, json=data, timeout=30)
-                
-                if resp.status_code == 200:
-                    json_data = resp.json()
-                    if 'data' in json_data and len(json_data['data']) > 0:
-                        image_url = json_data['data'][0]['url']
-                        print(f"✨ Gemini 3 Generated: {filename}")
-                        return AssetEngine._download_file(image_url, filename)
-                
-                # If we get here, Euron failed but didn't crash
-                # print(f"⚠️ Euron Image Error: {resp.text[:100]}... Switching to Fallback.")
-                
-            except Exception as e:
-                print(f"⚠️ Euron Connection Failed: {e}")
+        def euron(cancel):
+            return AssetEngine._generate_euron(prompt, f"{stem}.euron{ext}", euron_key, cancel)
 
         # --- FALLBACK: POLLINATIONS (FREE) ---
-        print(f"🎨 FALLBACK: Using Pollinations for '{prompt[:20]}...'")
+        def pollinations(cancel):
+            print(f"🎨 FALLBACK: Using Pollinations for '{prompt[:20]}...'")
+            return AssetEngine._generate_pollinations(prompt, f"{stem}.pollinations{ext}", pollinations_key, cancel)
+
+        primary = ("Euron Images", euron) if Config.EURIAI_API_KEY else None
+        secondary = ("Pollinations", pollinations)
+
+        if Config.AI_IMAGE_HEDGING:
+            # Race: Pollinations starts once Euron is slower than its usual latency
+            path, provider = hedged_call(primary, secondary, on_discard=AssetEngine._discard_file)
+        else:
+            path, provider = None, None
+            for name, func in filter(None, (primary, secondary)):
+                path = func(threading.Event())
+                if path:
+                    provider = name
+                    break
+
+        if not path:
+            return None
+        os.replace(path, save_path)
+        print(f"🎨 {provider} Generated: {filename}")
+        return save_path
+
+    @staticmethod
+    def _generate_euron(prompt, filename, cache_key, cancel):
+        """One Euron generation + download into TEMP_DIR/filename. Returns the path or None."""
+        headers = {
+            "Authorization": f"Bearer {Config.EURIAI_API_KEY}",
+            "Content-Type": "application/json"
+        }
+        # Euron uses standard OpenAI Image Format
+        data = {
+            "model": AssetEngine.EURON_IMAGE_MODEL,
+            "prompt": prompt,
+            "n": 1,
+            "size": "1024x1024",
+            "quality": "standard"
+        }
+
+        try:
+            resp = HttpClient.post(AssetEngine.EURON_IMAGE_URL, headers=headers, json=data, timeout=(5, 30))
+        except Exception as e:
+            print(f"⚠️ Euron Connection Failed: {e}")
+            return None
+
+        if resp.status_code != 200 or cancel.is_set():
+            return None
+        json_data = resp.json()
+        if 'data' in json_data and len(json_data['data']) > 0:
+            image_url = json_data['data'][0]['url']
+            return AssetEngine._download_file(image_url, filename, cache_key, cancel=cancel)
+        return None
+
+    @staticmethod
+    def _generate_pollinations(prompt, filename, cache_key, cancel):
         encoded_prompt = requests.utils.quote(prompt)
         # We request 9:16 vertical aspect ratio (1080x1920)
         url = f"https://image.pollinations.ai/prompt/{encoded_prompt}?width=1080&height=1920&model=flux"
-        
-        path = AssetEngine._download_file(url, filename)
-        if path:
-             print(f"🎨 Pollinations Generated: {filename}")
-             return path
-        return None
\ No newline at end of file
+        return AssetEngine._download_file(url, filename, cache_key, cancel=cancel)
+
+    @staticmethod
+    def _discard_file(path):
+        """Deletes a losing hedged result."""
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
\ No newline at end of file
@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.config import Config
+from src.modules.brain import Brain
+from src.modules.cache import hash_payload
+
+class BlueprintBatch:
+    """
+    Bulk blueprint generation for content calendars (50-200 topics at a time).
+    Topics run concurrently (Config.BATCH_WORKERS); every Brain call still goes
+    through the per-engine requests/tokens-per-minute buckets, the blueprint
+    cache and the provider router, so a batch can't blow through API limits.
+
+    Results are appended to a JSONL file as they finish, one line per topic:
+      {"key", "spec", "ok", "title", "blueprint", "error", "seconds", "finished_at"}
+    Re-running with the same file skips topics that already succeeded, so an
+    interrupted batch continues where it stopped (failed topics are retried).
+
+    A spec is a topic string or a dict with "topic" plus any of
+    language / structure / duration / audience / style / fresh.
+    """
+
+    SPEC_FIELDS = ("topic", "language", "structure", "duration", "audience", "style", "fresh")
+
+    @staticmethod
+    def stream(specs, output_path, workers=None, euri_key_override=None):
+        """
+        Generator over (spec, blueprint or None) in completion order.
+        Topics already completed in output_path are skipped (not yielded).
+        """
+        specs = [BlueprintBatch._normalize(spec) for spec in specs]
+        done = BlueprintBatch.completed_keys(output_path)
+        pending, seen = [], set(done)
+        for spec in specs:
+            key = BlueprintBatch.spec_key(spec)
+            if key not in seen:
+                seen.add(key)
+                pending.append((key, spec))
+
+        print(f"📅 BATCH: {len(specs)} topics, {len(specs) - len(pending)} already done, {len(pending)} to generate.")
+        if not pending:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        brain = Brain(euri_key_override=euri_key_override)
+        write_lock = threading.Lock()
+        executor = ThreadPoolExecutor(max_workers=workers or Config.BATCH_WORKERS, thread_name_prefix="aura-batch")
+        try:
+            futures = {executor.submit(BlueprintBatch._generate, brain, spec): (key, spec) for key, spec in pending}
+            for finished, future in enumerate(as_completed(futures), 1):
+                key, spec = futures[future]
+                blueprint, error, seconds = future.result()
+                BlueprintBatch._append(output_path, write_lock, {
+                    "key": key,
+                    "spec": spec,
+                    "ok": blueprint is not None,
+                    "title": (blueprint or {}).get('upload_metadata', {}).get('title'),
+                    "blueprint": blueprint,
+                    "error": error,
+                    "seconds": round(seconds, 2),
+                    "finished_at": time.time(),
+                })
+                mark = "✅" if blueprint else "❌"
+                print(f"{mark} BATCH [{finished}/{len(pending)}] {spec['topic']} ({seconds:.1f}s)")
+                yield spec, blueprint
+        finally:
+            # Interrupted (Ctrl+C / generator closed): drop what hasn't started, resume later
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def run(specs, output_path, workers=None, euri_key_override=None):
+        """Runs the whole batch. Returns {"generated", "failed", "skipped"} counts."""
+        specs = list(specs)
+        generated = failed = 0
+        for _, blueprint in BlueprintBatch.stream(specs, output_path, workers, euri_key_override):
+            if blueprint:
+                generated += 1
+            else:
+                failed += 1
+        return {"generated": generated, "failed": failed, "skipped": len(specs) - generated - failed}
+
+    @staticmethod
+    def load_results(output_path):
+        """{key: latest result line} from a batch file (unreadable / half-written lines are ignored)."""
+        results = {}
+        try:
+            with open(output_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict) and entry.get("key"):
+                        results[entry["key"]] = entry
+        except OSError:
+            pass
+        return results
+
+    @staticmethod
+    def completed_keys(output_path):
+        return {key for key, entry in BlueprintBatch.load_results(output_path).items() if entry.get("ok")}
+
+    @staticmethod
+    def spec_key(spec):
+        return hash_payload({k: v for k, v in spec.items() if k != "fresh"})
+
+    @staticmethod
+    def _normalize(spec):
+        if isinstance(spec, str):
+            spec = {"topic": spec}
+        spec = {k: v for k, v in spec.items() if k in BlueprintBatch.SPEC_FIELDS and v is not None}
+        spec["topic"] = " ".join(str(spec.get("topic", "")).split())
+        if not spec["topic"]:
+            raise ValueError("batch spec without a topic")
+        return spec
+
+    @staticmethod
+    def _generate(brain, spec):
+        start = time.perf_counter()
+        try:
+            blueprint = brain.generate_video_blueprint(**spec)
+            error = None if blueprint else "no valid blueprint"
+        except Exception as e:
+            blueprint, error = None, str(e)
+        return blueprint, error, time.perf_counter() - start
+
+    @staticmethod
+    def _append(output_path, lock, entry):
+        # One complete line per result, flushed to disk: a crash loses only the topics in flight
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with lock, open(output_path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def read_specs(path):
+        """Topic specs from a file: .json (list), .jsonl (one spec per line) or plain text (one topic per line)."""
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                return json.load(f)
+            if path.endswith(".jsonl"):
+                return [json.loads(line) for line in f if line.strip()]
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+if __name__ == "__main__":
+    # python -m src.modules.batch topics.txt [results.jsonl]
+    if len(sys.argv) < 2:
+        print("Usage: python -m src.modules.batch <topics.txt|.json|.jsonl> [results.jsonl]")
+        sys.exit(1)
+    topics_path = sys.argv[1]
+    results_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(
+        Config.BATCH_DIR, os.path.splitext(os.path.basename(topics_path))[0] + ".jsonl")
+    summary = BlueprintBatch.run(BlueprintBatch.read_specs(topics_path), results_path)
+    print(f"📅 BATCH DONE: {summary['generated']} generated, {summary['failed']} failed, "
+          f"{summary['skipped']} skipped. Results: {results_path}")
@@ -1,14 +1,29 @@
 import json
-import os
-import requests
+import threading
 from openai import OpenAI
 from src.config import Config
+from src.modules.cache import JsonCache, hash_payload
+from src.modules.jsonstream import JsonStream
+from src.modules.network import HttpClient, TokenBucket
+from src.modules.routing import ProviderRouter, ProviderStats, raced_stream
+from src.modules.schema import BlueprintSchema
 
 class Brain:
+    TEMPERATURE = 0.7
+
+    # Finished blueprints, keyed by everything that shapes the LLM's answer
+    _cache = JsonCache(Config.BLUEPRINT_CACHE_DIR, Config.BLUEPRINT_CACHE_MAX_MB, Config.BLUEPRINT_CACHE_TTL)
+    # Process-wide requests/tokens per minute buckets per engine (shared by every Brain and batch worker)
+    _rate_limits = {}
+    _rate_limits_lock = threading.Lock()
+
     def __init__(self, euri_key_override=None):
         self.openai_client = None
+        self.openai_model = "gpt-4o"
         if Config.OPENAI_API_KEY:
-            self.openai_client = OpenAI(api_key=Config.OPENAI_API_KEY)
+            # The SDK keeps its own pooled client; align its timeout/retries with HttpClient
+            self.openai_client = OpenAI(api_key=Config.OPENAI_API_KEY, timeout=Config.LLM_TIMEOUT[1],
+                                        max_retries=Config.HTTP_RETRIES)
         
         # Euri Configuration (Allow Override from UI for Creator Edition)
         self.euri_key = euri_key_override if euri_key_override else Config.EURIAI_API_KEY
@@ -99,48 +114,250 @@ Return ONLY valid JSON with this structure:
 }}
 """
 
-    def generate_video_blueprint(self, topic: str, language: str = "English", structure: str = "Default", duration: str = "60s", audience: str = "General", style: str = "Fast Paced"):
+    def generate_video_blueprint(self, topic: str, language: str = "English", structure: str = "Default", duration: str = "60s", audience: str = "General", style: str = "Fast Paced", fresh: bool = False, on_section=None):
+        """
+        Returns the blueprint dict, or None if every provider failed.
+        Identical requests are answered from the blueprint cache (Config.BLUEPRINT_CACHE_TTL);
+        fresh=True skips the lookup and always asks the LLM (the new answer is still cached).
+
+        Replies are streamed. on_section(section, value) is called as soon as a part
+        of the blueprint is complete: once per root key ("script", "upload_metadata", ...)
+        and once per scene ("scene", scene_dict), so downstream work can start while
+        the model is still writing the later scenes.
+        """
         print(f"🧠 AURA BRAIN: Analyzing '{topic}' [{structure}] for {audience} in {style} style...")
         
         # Load the Master Prompt with NEW Inputs
         system_instruction = self._get_master_prompt(language, structure, duration, audience, style)
 
-        # --- ATTEMPT 1: OPENAI (PRIMARY) ---
-        if self.openai_client:
+        sent = {}   # section -> value handed to on_section (scenes: "scene:<id>")
+        def emit(section, value):
+            if not on_section:
+                return
+            sent[f"scene:{value.get('id')}" if section == "scene" else section] = value
             try:
-                print("🔹 Attempting with OpenAI...")
-                return self._call_openai(topic, system_instruction)
+                on_section(section, value)
             except Exception as e:
-                print(f"⚠️ OpenAI Failed: {e}")
-                print("🔄 Switching to Backup Engine (Euri AI)...")
-        
-        # --- ATTEMPT 2: EURI AI (FALLBACK) ---
+                print(f"⚠️ Blueprint section handler error ({section}): {e}")
+
+        cache_key = self._cache_key(topic, system_instruction)
+        if not fresh:
+            cached = Brain._cache.load(cache_key)
+            if cached:
+                blueprint = cached['blueprint']
+                print(f"♻️ BLUEPRINT CACHE HIT ({cached.get('model')}): {blueprint.get('upload_metadata', {}).get('title', 'Untitled')}")
+                Brain._replay(blueprint, emit, sent)
+                return blueprint
+
+        providers = {}
+        if self.openai_client:
+            providers["OpenAI"] = (self.openai_model, Brain._limited("OpenAI", self._call_openai))
         if self.euri_key:
-            try:
-                return self._call_euri(topic, system_instruction)
-            except Exception as e:
-                print(f"❌ Euri AI Failed: {e}")
+            providers["Euri AI"] = (self.euri_model, Brain._limited("Euri AI", self._call_euri))
         else:
             print("⚠️ No Euri API Key found in .env or Settings")
 
+        # Fastest healthy engine first; engines with an open circuit breaker only as a last resort
+        queue = ProviderRouter.order(list(providers))
+        queue = [name for name in queue if ProviderStats.for_provider(name).breaker.state != "open"] or queue
+
+        while queue:
+            parsers, closed = {}, {}
+            def attempt(name):
+                model, call = providers[name]
+                used_ids = set()
+                closed[name] = set()    # Root members the stream finished
+
+                def on_member(key, value):
+                    closed[name].add(key)
+                    if key != "scenes":
+                        emit(key, value)
+
+                parser = parsers[name] = JsonStream(
+                    on_member=on_member,
+                    # Streamed scenes get the same id/visual repairs the finished blueprint will
+                    on_item=lambda key, index, value: key == "scenes" and isinstance(value, dict) and emit(
+                        "scene", BlueprintSchema.repair_scene(value, index, used_ids)),
+                )
+
+                def run(ticket):
+                    owns = []
+                    def on_text(chunk):
+                        if not owns:
+                            owns.append(ticket.claim())
+                        if not owns[0]:
+                            raise InterruptedError("another engine answered first")
+                        parser.feed(chunk)
+                    print(f"🔹 Attempting with {name}...")
+                    return call(topic, system_instruction, on_text, ticket=ticket)
+                return name, run
+
+            outcome = raced_stream(attempt(queue[0]), attempt(queue[1]) if len(queue) > 1 else None)
+            queue = [name for name in queue if name not in outcome['launched']]
+            for name in outcome['failed']:
+                if name != outcome['name']:
+                    ProviderStats.for_provider(name).record_failure()
+
+            name = outcome['name']
+            model, call = providers[name]
+            error = outcome['error']
+            if error:
+                print(f"⚠️ {name} Failed: {error}")
+            # Whatever arrived before a failure may still be repairable. A stream that broke
+            # off inside the scene list has an unknown number of scenes still to come.
+            raw_content = outcome['result'] or parsers[name].text
+            scenes_cut = bool(error) and "scenes" not in closed[name]
+
+            # The engine whose stream just died is the worst one to ask for the rest:
+            # follow-ups after a failure go to a healthy backup when there is one
+            helper = name
+            if error:
+                helper = next((n for n in providers if n != name and n not in outcome['failed']
+                               and ProviderStats.for_provider(n).breaker.state != "open"), name)
+                if helper != name:
+                    ProviderRouter.record(helper, "fallback")
+            helper_call = providers[helper][1]
+
+            def complete(partial, missing, cont=False):
+                if helper != name:
+                    print(f"🔄 Asking {helper} to finish {name}'s blueprint...")
+                return self._complete(helper_call, topic, partial, missing, cont)
+
+            blueprint = self._remember(cache_key, model, raw_content, complete, error=error, scenes_cut=scenes_cut)
+            stats = ProviderStats.for_provider(name)
+            if error:
+                # A broken stream counts against the engine even when the follow-up saved the blueprint
+                stats.record_failure()
+            if blueprint:
+                if not error:
+                    stats.record_success(outcome['seconds'])
+                ProviderRouter.record(name, "served" if not error else "salvaged")
+                # Parts that only exist after repair / the follow-up request
+                Brain._replay(blueprint, emit, sent)
+                return blueprint
+            if not error:
+                stats.record_failure()
+
+            if any(key == "script" or key.startswith("scene:") for key in sent):
+                # Script/scenes already handed downstream can't be swapped for another engine's,
+                # and rendering only what arrived would ship a truncated video: fail the job
+                print(f"❌ {name} broke off after {len(sent)} blueprint section(s) and the rest could not be recovered.")
+                return None
+            if queue:
+                print(f"🔄 Switching to Backup Engine ({queue[0]})...")
+                ProviderRouter.record(queue[0], "fallback")
+
         print("❌ CRITICAL: Both Brains failed.")
         return None
 
-    def _call_openai(self, topic, system_instruction):
-        """Standard OpenAI Call"""
-        response = self.openai_client.chat.completions.create(
-            model="gpt-4o",
+    @staticmethod
+    def _limited(name, call):
+        """Wraps a provider call in that engine's RPM/TPM buckets (Config.LLM_RATE_LIMITS)."""
+        with Brain._rate_limits_lock:
+            if name not in Brain._rate_limits:
+                limits = Config.LLM_RATE_LIMITS.get(name, {})
+                Brain._rate_limits[name] = (
+                    TokenBucket(f"{name} requests/min", limits.get("rpm", 60)),
+                    TokenBucket(f"{name} tokens/min", limits.get("tpm", 60000)),
+                )
+            requests_bucket, tokens_bucket = Brain._rate_limits[name]
+
+        def limited(topic, system_instruction, on_text=None, ticket=None):
+            """ticket: the raced_stream StreamTicket, if this call is part of a race."""
+            # ~4 characters per token; the reply is reserved at its maximum and refunded after
+            reserved = (len(system_instruction) + len(topic)) // 4 + Config.LLM_MAX_OUTPUT_TOKENS
+            requests_bucket.acquire()
+            tokens_bucket.acquire(reserved)
+            if ticket is not None:
+                if ticket.lost():
+                    # The race was decided while this call queued on its limits: don't send (or pay) it
+                    requests_bucket.refund(1)
+                    tokens_bucket.refund(reserved)
+                    raise InterruptedError("another engine answered first")
+                ticket.sent()
+
+            received = [0]
+            def counting(chunk):
+                received[0] += len(chunk)
+                if on_text:
+                    on_text(chunk)
+            try:
+                return call(topic, system_instruction, counting)
+            finally:
+                # Also on failures/cancels: only what actually streamed back is kept
+                tokens_bucket.refund(Config.LLM_MAX_OUTPUT_TOKENS - received[0] // 4)
+        return limited
+
+    @staticmethod
+    def _replay(blueprint, emit, sent):
+        """Delivers a finished blueprint section by section, like a stream would (skipping what was sent)."""
+        for key, value in blueprint.items():
+            if key == "scenes":
+                for scene in value:
+                    if f"scene:{scene.get('id')}" not in sent:
+                        emit("scene", scene)
+            elif value and sent.get(key) != value:
+                emit(key, value)
+
+    def _cache_key(self, topic, system_instruction):
+        """
+        Exact-match key: the system prompt already carries language, structure,
+        duration, audience and style. Both models are part of it, since either
+        may answer.
+        """
+        return hash_payload({
+            "system": system_instruction,
+            "topic": " ".join(topic.split()),
+            "models": [self.openai_model, self.euri_model],
+            "temperature": Brain.TEMPERATURE,
+        })
+
+    def _remember(self, cache_key, model, raw_content, complete=None, error=None, scenes_cut=False):
+        """
+        Parses a raw LLM reply and caches it (the raw text is kept next to the blueprint for debugging).
+        Replies that didn't yield a blueprint, or whose stream broke off (error), are kept
+        under their own key (Brain.failure_key), so they never answer a lookup.
+        """
+        blueprint = self._process_response(raw_content, complete, scenes_cut)
+        if blueprint and not error:
+            Brain._cache.store(cache_key, {"model": model, "blueprint": blueprint, "raw_response": raw_content})
+        else:
+            Brain._cache.store(Brain.failure_key(cache_key, model), {
+                "model": model,
+                "raw_response": raw_content,
+                "error": str(error) if error else "reply did not yield a valid blueprint",
+                "salvaged": blueprint is not None,
+            })
+        return blueprint
+
+    @staticmethod
+    def failure_key(cache_key, model):
+        """Blueprint cache key of the last failed reply from model for cache_key's request."""
+        return hash_payload({"failed": cache_key, "model": model})
+
+    def _call_openai(self, topic, system_instruction, on_text=None):
+        """Streaming OpenAI Call. Returns the full reply text; on_text(chunk) sees it as it arrives."""
+        stream = self.openai_client.chat.completions.create(
+            model=self.openai_model,
             messages=[
                 {"role": "system", "content": system_instruction},
                 {"role": "user", "content": f"Topic: {topic}"}
             ],
             response_format={"type": "json_object"},
-            temperature=0.7
+            temperature=Brain.TEMPERATURE,
+            stream=True
         )
-        return self._process_response(response.choices[0].message.content)
+        parts = []
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                parts.append(text)
+                if on_text:
+                    on_text(text)
+        return "".join(parts)
 
-    def _call_euri(self, topic, system_instruction):
-        """Fallback Euri Call using Requests"""
+    def _call_euri(self, topic, system_instruction, on_text=None):
+        """Fallback Euri Call using Requests (streamed as server-sent events)"""
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.euri_key}"
@@ -154,41 +371,105 @@ Return ONLY valid JSON with this structure:
                 {"role": "user", "content": user_prompt}
             ],
             "model": self.euri_model,
-            "max_tokens": 3000, # Increased for larger 4.6 blueprints
-            "temperature": 0.7
+            "max_tokens": Config.LLM_MAX_OUTPUT_TOKENS, # Increased for larger 4.6 blueprints
+            "temperature": Brain.TEMPERATURE,
+            "stream": True
         }
 
-        response = requests.post(self.euri_url, headers=headers, json=payload)
-        
-        if response.status_code != 200:
-            raise Exception(f"API Error {response.status_code}: {response.text}")
-            
-        data = response.json()
-        raw_content = data['choices'][0]['message']['content']
-        return self._process_response(raw_content)
-
-    def _process_response(self, raw_content):
-        """Helper to parse and save debug JSON"""
-        # Save Debug
-        debug_path = os.path.join(Config.TEMP_DIR, "debug_last_response.json")
-        try:
-            with open(debug_path, "w", encoding="utf-8") as f:
-                f.write(raw_content)
-        except Exception:
-            pass
-            
+        with HttpClient.post(self.euri_url, headers=headers, json=payload, timeout=Config.LLM_TIMEOUT,
+                             stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"API Error {response.status_code}: {response.text}")
+
+            if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                # Endpoint ignored "stream": one plain completion
+                content = response.json()['choices'][0]['message']['content']
+                if on_text:
+                    on_text(content)
+                return content
+
+            response.encoding = response.encoding or "utf-8"
+            parts = []
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get('choices') or [{}]
+                text = (choices[0].get('delta') or {}).get('content')
+                if text:
+                    parts.append(text)
+                    if on_text:
+                        on_text(text)
+            return "".join(parts)
+
+    def _complete(self, call, topic, partial, missing, continue_scenes=False):
+        """
+        Targeted follow-up: asks an engine (call) for ONLY the missing sections,
+        with what already exists as context. Returns {section: value} ({} on failure).
+        continue_scenes: the existing scene list was cut off; "scenes" then holds
+        only the scenes that come after it.
+        """
+        shapes = {
+            "script": '"script": { "full_voiceover": "...", "hook": "...", "mood": "Energetic" }',
+            "scenes": '"scenes": [ { "id": 1, "narration": "...", "visual": { "query": "...", "fallback": "..." }, '
+                      '"overlay_text": "...", "duration_estimate": 3.5 } ]',
+        }
+        instruction = (
+            "You complete a partially written short-video plan.\n"
+            "Keep everything consistent with the existing parts (scenes narrate the voiceover in order;\n"
+            "every scene gets a highly specific Pexels search query).\n"
+            "Return ONLY valid JSON with exactly these keys:\n{\n  " + ",\n  ".join(shapes[s] for s in missing) + "\n}"
+        )
+        context = {k: v for k, v in partial.items() if k in ("upload_metadata", "script", "scenes") and v}
+        request = f"{topic}\nExisting plan: {json.dumps(context, ensure_ascii=False)}\nWrite only: {', '.join(missing)}"
+        if continue_scenes:
+            last_id = max((s['id'] for s in partial.get('scenes', [])), default=0)
+            request += (f"\nThe scene list was cut off after scene {last_id}. Keep those scenes as they are and "
+                        f"write only the scenes that follow (ids from {last_id + 1}), covering the rest of the voiceover.")
         try:
-            # Clean up potential markdown formatting
-            clean_content = raw_content.replace("```json", "").replace("```", "").strip()
-            blueprint = json.loads(clean_content)
-        except json.JSONDecodeError:
+            answer = BlueprintSchema.parse(call(request, instruction))
+        except Exception as e:
+            print(f"⚠️ Follow-up request failed: {e}")
+            return {}
+        return {section: answer[section] for section in missing if answer and section in answer}
+
+    def _process_response(self, raw_content, complete=None, scenes_cut=False):
+        """
+        Parses, repairs and validates a raw LLM reply. Returns the blueprint or None.
+        complete(partial, missing, continue_scenes) -> {section: value} fetches sections
+        repair couldn't rebuild.
+        scenes_cut: the reply broke off inside the scene list. The scenes that arrived
+        are only kept if the follow-up supplies the ones after them.
+        """
+        blueprint = BlueprintSchema.parse(raw_content)
+        if blueprint is None:
             print("❌ Error: AI did not return valid JSON.")
             return None
-        
-        # Validation
-        if not blueprint.get('script', {}).get('full_voiceover'):
-             print("❌ JSON missing script.")
+
+        missing = BlueprintSchema.repair(blueprint)
+        if scenes_cut and "scenes" not in missing:
+            print(f"🩹 Blueprint broke off after {len(blueprint['scenes'])} scene(s). Requesting the rest...")
+            received = len(blueprint['scenes'])
+            rest = (complete(blueprint, ["scenes"], True) if complete else {}).get('scenes')
+            blueprint['scenes'] = blueprint['scenes'] + (rest if isinstance(rest, list) else [])
+            missing = BlueprintSchema.repair(blueprint)
+            if len(blueprint['scenes']) <= received:
+                print("❌ The rest of the scenes could not be recovered.")
+                return None
+        if missing and complete:
+            print(f"🩹 Blueprint is missing {', '.join(missing)}. Requesting just that...")
+            blueprint.update(complete(blueprint, missing))
+            missing = BlueprintSchema.repair(blueprint)
+
+        # Validation: never hand on (or cache) a blueprint without a script or scenes
+        if missing:
+             print(f"❌ JSON missing {', '.join(missing)}.")
              return None
+        errors = BlueprintSchema.validate(blueprint)
+        if errors:
+            print(f"⚠️ Blueprint schema: {'; '.join(errors[:5])}")
              
         print(f"✅ BLUEPRINT GENERATED: {blueprint.get('upload_metadata', {}).get('title', 'Untitled')}")
         return blueprint
\ No newline at end of file
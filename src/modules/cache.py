@@ -0,0 +1,229 @@
+import os
+import json
+import shutil
+import hashlib
+import time
+import threading
+
+# (path, size, mtime) -> sha256, so unchanged files are only read once per process
+_FILE_HASHES = {}
+_FILE_HASHES_LOCK = threading.Lock()
+
+
+def hash_payload(payload):
+    """Stable sha256 of any JSON-like structure (dict key order doesn't matter)."""
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def hash_file(path):
+    """sha256 of a file's contents, or None if it doesn't exist."""
+    if not path or not os.path.exists(path):
+        return None
+
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _FILE_HASHES_LOCK:
+        if memo_key in _FILE_HASHES:
+            return _FILE_HASHES[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    with _FILE_HASHES_LOCK:
+        _FILE_HASHES[memo_key] = digest.hexdigest()
+    return _FILE_HASHES[memo_key]
+
+
+def touch(path):
+    """Marks a cache entry as recently used (LRU order is by mtime)."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def prune_directory(folder_path, max_bytes):
+    """Deletes least-recently-used files until the folder fits in max_bytes."""
+    if not os.path.isdir(folder_path):
+        return
+
+    entries = []
+    total = 0
+    for root, _, files in os.walk(folder_path):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def place_file(src_path, dest_path):
+    """Hard-links a cached file into a workspace, falling back to a copy (other drive, no link support)."""
+    try:
+        if os.path.exists(dest_path):
+            os.unlink(dest_path)
+        os.link(src_path, dest_path)
+    except OSError:
+        shutil.copyfile(src_path, dest_path)
+    return dest_path
+
+
+class DiskCache:
+    """
+    Content-addressed file store with a size cap.
+    Entries live at <folder>/<key[:2]>/<key><ext>, are written atomically
+    (temp file + rename) and evicted least-recently-used first.
+    """
+
+    def __init__(self, folder_path, max_mb):
+        self.folder_path = folder_path
+        self.max_bytes = max_mb * 1024 * 1024
+        os.makedirs(folder_path, exist_ok=True)
+
+    def path_for(self, key, ext=""):
+        return os.path.join(self.folder_path, key[:2], f"{key}{ext}")
+
+    def get(self, key, ext=""):
+        """Path of a cached entry (marked as recently used), or None on a miss."""
+        path = self.path_for(key, ext)
+        if not os.path.exists(path):
+            return None
+        touch(path)
+        return path
+
+    def write(self, key, data, ext=""):
+        """Stores bytes (or a str) under key. Returns the entry path or None on failure."""
+        path = self.path_for(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data.encode("utf-8") if isinstance(data, str) else data)
+            os.replace(tmp_path, path)
+            return path
+        except OSError as e:
+            print(f"⚠️ Cache Write Error: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return None
+
+    def put(self, key, src_path, ext=""):
+        """Copies an existing file into the cache. Returns the entry path or None on failure."""
+        path = self.path_for(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+            return path
+        except OSError as e:
+            print(f"⚠️ Cache Write Error: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return None
+
+    def get_json(self, key, ext=".json"):
+        path = DiskCache.get(self, key, ext)
+        if not path:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_json(self, key, payload, ext=".json"):
+        return self.write(key, json.dumps(payload, ensure_ascii=False), ext)
+
+    def prune(self):
+        prune_directory(self.folder_path, self.max_bytes)
+
+
+class MediaCache(DiskCache):
+    """
+    DiskCache for downloaded media (stock clips, AI images).
+    Every entry has a JSON sidecar with its size + sha256, checked on read,
+    so a truncated or corrupted file is dropped instead of rendered.
+    """
+
+    def get(self, key, ext=""):
+        path = self.path_for(key, ext)
+        meta = self.get_json(key, f"{ext}.meta.json")
+        if not meta or not os.path.exists(path):
+            return None
+
+        if os.path.getsize(path) != meta.get("size") or hash_file(path) != meta.get("sha256"):
+            print(f"⚠️ Media cache entry {key[:12]} failed its integrity check. Dropping it.")
+            self.discard(key, ext)
+            return None
+
+        touch(path)
+        return path
+
+    def put(self, key, src_path, ext="", source=None):
+        """Stores a finished download. Empty files are never cached."""
+        if not src_path or not os.path.exists(src_path) or os.path.getsize(src_path) == 0:
+            return None
+
+        path = DiskCache.put(self, key, src_path, ext)
+        if not path:
+            return None
+
+        # Sidecar last: the entry only becomes visible once the media is fully in place
+        meta = {"size": os.path.getsize(path), "sha256": hash_file(path), "source": source}
+        if not self.put_json(key, meta, f"{ext}.meta.json"):
+            return None
+        self.prune()
+        return path
+
+    def discard(self, key, ext=""):
+        for path in (self.path_for(key, ext), self.path_for(key, f"{ext}.meta.json")):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+class JsonCache(DiskCache):
+    """
+    DiskCache for small JSON documents (API responses) with a time-to-live.
+    Expired entries are kept until evicted, so callers can fall back to a
+    stale answer when the live API is unavailable.
+    """
+
+    def __init__(self, folder_path, max_mb, ttl_seconds):
+        DiskCache.__init__(self, folder_path, max_mb)
+        self.ttl_seconds = ttl_seconds
+
+    def load(self, key, allow_stale=False):
+        """Cached payload, or None on a miss (or when expired, unless allow_stale)."""
+        entry = self.get_json(key)
+        if not entry or "payload" not in entry:
+            return None
+        if not allow_stale and time.time() - entry.get("stored_at", 0) > self.ttl_seconds:
+            return None
+        return entry["payload"]
+
+    def store(self, key, payload):
+        path = self.put_json(key, {"stored_at": time.time(), "payload": payload})
+        self.prune()
+        return path
@@ -0,0 +1,214 @@
+import os
+import bisect
+import functools
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from src.config import Config
+
+class CaptionRenderer:
+    """
+    In-process caption rasterizer (Pillow).
+    Replaces TextClip(method='caption'), which launched ImageMagick and wrote
+    temp files for every chunk. Fonts, word metrics and finished RGBA sprites
+    are all cached, so repeated captions (watermarks, re-renders) are free.
+    """
+
+    # Scratch canvas used only for measuring
+    _MEASURE = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def get_font(font_size, font_path=None):
+        """Loads a TrueType font once per (path, size)."""
+        try:
+            return ImageFont.truetype(font_path or Config.FONT_NAME, font_size)
+        except Exception:
+            print(f"⚠️ Font not found ({font_path or Config.FONT_NAME}). Using Pillow default.")
+            return ImageFont.load_default()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def measure(text, font_size, font_path=None, stroke_width=0):
+        """Pixel width of a word/line (glyph metrics cache)."""
+        font = CaptionRenderer.get_font(font_size, font_path)
+        return CaptionRenderer._MEASURE.textlength(text, font=font) + 2 * stroke_width
+
+    @staticmethod
+    def wrap(text, font_size, max_width, font_path=None, stroke_width=0):
+        """Greedy word wrap against a pixel width, using cached word metrics."""
+        if not max_width:
+            return [text]
+
+        space = CaptionRenderer.measure(" ", font_size, font_path)
+        lines, current, current_w = [], [], 0
+        for word in text.split():
+            word_w = CaptionRenderer.measure(word, font_size, font_path, stroke_width)
+            needed = word_w if not current else current_w + space + word_w
+            if current and needed > max_width:
+                lines.append(" ".join(current))
+                current, current_w = [word], word_w
+            else:
+                current.append(word)
+                current_w = needed
+        if current:
+            lines.append(" ".join(current))
+        return lines
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def render(text, font_size, color, stroke_color=None, stroke_width=0,
+               max_width=None, align="center", font_path=None, opacity=1.0):
+        """
+        Rasterizes text into a tightly cropped RGBA sprite (H x W x 4 uint8).
+        The returned array is cached and read-only: copy it before mutating.
+        """
+        font = CaptionRenderer.get_font(font_size, font_path)
+        wrapped = "\n".join(CaptionRenderer.wrap(text, font_size, max_width, font_path, stroke_width))
+
+        left, top, right, bottom = (int(round(v)) for v in CaptionRenderer._MEASURE.multiline_textbbox(
+            (0, 0), wrapped, font=font, align=align, stroke_width=stroke_width
+        ))
+        img = Image.new("RGBA", (max(1, right - left + 2), max(1, bottom - top + 2)), (0, 0, 0, 0))
+        ImageDraw.Draw(img).multiline_text(
+            (-left + 1, -top + 1), wrapped, font=font, fill=color, align=align,
+            stroke_width=stroke_width, stroke_fill=stroke_color
+        )
+
+        sprite = np.array(img)
+        if opacity < 1.0:
+            sprite[:, :, 3] = (sprite[:, :, 3] * opacity).astype(np.uint8)
+        sprite.setflags(write=False)
+        return sprite
+
+    @staticmethod
+    def overlay_style(profile):
+        """Scene overlay text: big white caption with a black stroke, wrapped at 900px (1080p)."""
+        px = lambda v: max(1, int(round(v * profile['scale'])))
+        # Preview skips the stroke pass (the slow part of caption rendering)
+        stroke = {} if profile['fast_captions'] else {"stroke_color": "black", "stroke_width": px(4)}
+        return dict(font_size=px(80), color="white", max_width=px(900), align="center", **stroke)
+
+    @staticmethod
+    def watermark_style(profile):
+        """Small semi-transparent channel handle."""
+        return dict(font_size=max(1, int(round(30 * profile['scale']))), color="white", opacity=0.6)
+
+    @staticmethod
+    def save_png(output_path, text, **style):
+        """Writes a rendered sprite to disk (for the ffmpeg overlay filter)."""
+        try:
+            Image.fromarray(CaptionRenderer.render(text, **style)).save(output_path)
+            return True
+        except Exception as e:
+            print(f"⚠️ Caption Raster Error: {e}")
+            return False
+
+
+class CaptionTrack:
+    """
+    Single-layer caption track.
+    Holds a sorted list of (start, end, sprite) plus static overlays (logo,
+    watermark). Each frame finds the active caption with one bisect and blends
+    only the sprites' bounding boxes, instead of compositing N TextClips.
+    Captions must not overlap in time.
+    """
+
+    def __init__(self, frame_size):
+        self.frame_w, self.frame_h = frame_size
+        self.starts = []
+        self.entries = []   # (start, end, layer), sorted by start
+        self.static = []    # layers drawn on every frame
+
+    def add(self, start, end, sprite, position=("center", "center")):
+        """Adds a timed sprite (RGBA array) shown for start <= t < end."""
+        layer = self._prepare(sprite, position)
+        if layer is None:
+            return
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.entries.insert(i, (start, end, layer))
+
+    def add_static(self, sprite, position):
+        """Adds a sprite drawn on every frame (logo, watermark)."""
+        layer = self._prepare(sprite, position)
+        if layer is not None:
+            self.static.append(layer)
+
+    def __bool__(self):
+        return bool(self.entries or self.static)
+
+    def apply(self, clip):
+        """Returns the clip with the whole track blended in a single pass per frame."""
+        if not self:
+            return clip
+        return clip.fl(lambda get_frame, t: self.render_frame(get_frame(t), t))
+
+    def render_frame(self, frame, t):
+        # Source frames can be shared (ImageClip, repeated reader frames): blend into one copy
+        frame = np.array(frame, dtype=np.uint8, copy=True)
+
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i >= 0:
+            start, end, layer = self.entries[i]
+            if start <= t < end:
+                CaptionTrack._blend(frame, layer)
+
+        for layer in self.static:
+            CaptionTrack._blend(frame, layer)
+        return frame
+
+    def _prepare(self, sprite, position):
+        """Clips the sprite to the frame and precomputes premultiplied color + inverse alpha."""
+        h, w = sprite.shape[:2]
+        x = CaptionTrack._resolve(position[0], w, self.frame_w)
+        y = CaptionTrack._resolve(position[1], h, self.frame_h)
+
+        # Visible part of the sprite
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.frame_w), min(y + h, self.frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        crop = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+        alpha = crop[:, :, 3:4].astype(np.float32) / 255.0
+        premult = crop[:, :, :3].astype(np.float32) * alpha
+        return (slice(y0, y1), slice(x0, x1), premult, 1.0 - alpha)
+
+    @staticmethod
+    def _blend(frame, layer):
+        rows, cols, premult, inv_alpha = layer
+        region = frame[rows, cols]
+        region[...] = region * inv_alpha + premult
+
+    @staticmethod
+    def _resolve(pos, size, frame_size):
+        """'center' / 'left' / 'right' / 'top' / 'bottom', int pixels, or float fraction of the frame."""
+        if pos == "center":
+            return int(round((frame_size - size) / 2))
+        if pos in ("left", "top"):
+            return 0
+        if pos in ("right", "bottom"):
+            return frame_size - size
+        if isinstance(pos, float):
+            return int(round(pos * frame_size))
+        return int(pos)
+
+    @staticmethod
+    def load_image(path, height, opacity=1.0):
+        """Loads an image (logo) as a read-only RGBA sprite scaled to a pixel height."""
+        # The Studio rewrites the same logo path for every upload: key the cache on the file's version too
+        stat = os.stat(path)
+        return CaptionTrack._load_image(path, stat.st_mtime_ns, stat.st_size, height, opacity)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _load_image(path, mtime_ns, size, height, opacity):
+        with Image.open(path) as img:
+            img = img.convert("RGBA")
+            width = max(1, int(round(img.width * height / img.height)))
+            img = img.resize((width, height), Image.LANCZOS)
+        sprite = np.array(img)
+        if opacity < 1.0:
+            sprite[:, :, 3] = (sprite[:, :, 3] * opacity).astype(np.uint8)
+        sprite.setflags(write=False)
+        return sprite
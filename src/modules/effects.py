@@ -0,0 +1,80 @@
+import numpy as np
+from PIL import Image, ImageOps
+from moviepy.editor import VideoClip
+
+class KenBurnsClip(VideoClip):
+    """
+    Zoom/pan clip for still images.
+    The still is conformed ONCE to the output size; every frame is then a
+    sub-pixel crop box + a single resample straight to the output size.
+    Replaces `clip.resize(lambda t: ...)`, which re-resampled the full frame to
+    a growing size and re-composited it centered for every output frame.
+    Frame geometry (truncated zoomed size, truncated crop origin) and the LANCZOS
+    filter are the same as that chain, so the look doesn't drift from it over time.
+    """
+
+    # Progress (0..1) -> eased progress (0..1)
+    EASINGS = {
+        "linear": lambda p: p,
+        "ease_in": lambda p: p * p,
+        "ease_out": lambda p: 1 - (1 - p) * (1 - p),
+        "ease_in_out": lambda p: p * p * (3 - 2 * p),
+    }
+
+    # Where the zoom drifts toward, as (x, y) anchors: 0 = left/top, 1 = right/bottom
+    PAN_ANCHORS = {
+        "center": (0.5, 0.5),
+        "left": (0.0, 0.5),
+        "right": (1.0, 0.5),
+        "up": (0.5, 0.0),
+        "down": (0.5, 1.0),
+    }
+
+    def __init__(self, image, duration, size=(1080, 1920), zoom_rate=0.04,
+                 easing="linear", pan="center"):
+        self.out_w, self.out_h = size
+        self.zoom_total = zoom_rate * duration
+        self.ease = KenBurnsClip.EASINGS.get(easing, KenBurnsClip.EASINGS["linear"])
+        self.anchor = KenBurnsClip.PAN_ANCHORS.get(pan, KenBurnsClip.PAN_ANCHORS["center"])
+        self.clip_duration = duration
+
+        if isinstance(image, np.ndarray):
+            img = Image.fromarray(image)
+        elif isinstance(image, Image.Image):
+            img = image
+        else:
+            img = Image.open(image)
+        img = ImageOps.exif_transpose(img).convert("RGB")
+
+        # 1. Center crop to the output ratio (whole pixels), one LANCZOS pass per scene
+        w, h = img.size
+        target_ratio = self.out_w / self.out_h
+        if w / h > target_ratio:
+            new_w = int(h * target_ratio)
+            x1 = w / 2 - new_w / 2
+            img = img.crop((int(x1), 0, int(x1 + new_w), h))
+        else:
+            new_h = int(w / target_ratio)
+            y1 = h / 2 - new_h / 2
+            img = img.crop((0, int(y1), w, int(y1 + new_h)))
+        self.source = img.resize((self.out_w, self.out_h), Image.LANCZOS)
+
+        VideoClip.__init__(self, make_frame=self._make_frame, duration=duration)
+
+    def _crop_box(self, t):
+        """Sub-pixel crop box (in source pixels) for time t."""
+        progress = 0.0 if self.clip_duration <= 0 else min(max(t / self.clip_duration, 0.0), 1.0)
+        zoom = 1 + self.zoom_total * self.ease(progress)
+
+        # The source scaled by zoom (truncated to whole pixels), then an output-sized
+        # window at a whole-pixel origin; mapped back into source pixels
+        scaled_w, scaled_h = int(self.out_w * zoom), int(self.out_h * zoom)
+        x0 = int((scaled_w - self.out_w) * self.anchor[0])
+        y0 = int((scaled_h - self.out_h) * self.anchor[1])
+        sx, sy = self.out_w / scaled_w, self.out_h / scaled_h
+        return (x0 * sx, y0 * sy, (x0 + self.out_w) * sx, (y0 + self.out_h) * sy)
+
+    def _make_frame(self, t):
+        # 2. One resample per frame: crop box -> output size
+        frame = self.source.resize((self.out_w, self.out_h), Image.LANCZOS, box=self._crop_box(t))
+        return np.asarray(frame)
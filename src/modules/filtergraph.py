@@ -0,0 +1,141 @@
+import os
+from src.config import Config
+from src.modules.captions import CaptionRenderer
+from src.modules.utils import run_ffmpeg, find_music_track
+
+class FFmpegRenderer:
+    """
+    Native render backend.
+    Compiles a blueprint + asset map into ONE ffmpeg filter_complex graph and
+    runs it as a single subprocess, so no frame ever passes through Python.
+    MoviePy (VideoEditor) stays the fallback when this backend fails.
+    """
+
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+    PLACEHOLDER_COLOR = "0x14141e"
+
+    @staticmethod
+    def render(blueprint, assets, timeline, master_duration, output_path, profile):
+        """Renders the final video to output_path. Returns the path or None on failure."""
+        work_dir = os.path.join(Config.TEMP_DIR, f"filtergraph_{profile['name']}")
+        os.makedirs(work_dir, exist_ok=True)
+
+        try:
+            args = FFmpegRenderer.build_command(blueprint, assets, timeline, master_duration, output_path, work_dir, profile)
+        except Exception as e:
+            print(f"⚠️ Filtergraph Build Error: {e}")
+            return None
+
+        print("🚀 Rendering Final Export (native ffmpeg graph)...")
+        if not run_ffmpeg(args, label="Filtergraph render"):
+            return None
+
+        print("✅ RENDER COMPLETE.")
+        return output_path
+
+    @staticmethod
+    def build_command(blueprint, assets, timeline, master_duration, output_path, work_dir, profile):
+        """Returns the ffmpeg argument list (inputs, filter_complex, encoder settings)."""
+        W, H, fps = profile['width'], profile['height'], profile['fps']
+        px = lambda v: max(1, int(round(v * profile['scale'])))
+        video_paths = assets.get('video_paths', {})
+
+        inputs = []   # one argument list per ffmpeg input, index == stream index
+        filters = []
+
+        def add_input(*input_args):
+            inputs.append(list(input_args))
+            return len(inputs) - 1
+
+        # 1. Voiceover (master clock)
+        voice_idx = add_input("-i", assets['audio_path'])
+
+        # 2. Scene visuals -> conformed W x H @ fps segments
+        scene_labels = []
+        for i, (scene, _, duration) in enumerate(timeline):
+            clip_path = video_paths.get(scene['id'])
+            dur = f"{duration:.3f}"
+            label = f"s{i}"
+            conform = f"scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},setsar=1"
+
+            if clip_path and os.path.exists(clip_path) and clip_path.lower().endswith(FFmpegRenderer.IMAGE_EXTENSIONS):
+                # Stills: Ken Burns via zoompan (same centered zoom rate as the MoviePy path)
+                idx = add_input("-loop", "1", "-framerate", str(fps), "-t", dur, "-i", clip_path)
+                filters.append(
+                    f"[{idx}:v]{conform},"
+                    f"zoompan=z='1+{Config.KEN_BURNS_ZOOM_RATE}*on/{fps}':x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)'"
+                    f":d=1:s={W}x{H}:fps={fps},"
+                    f"trim=duration={dur},setpts=PTS-STARTPTS[{label}]"
+                )
+            elif clip_path and os.path.exists(clip_path):
+                # Video: loop if too short, cut if too long
+                idx = add_input("-stream_loop", "-1", "-t", dur, "-i", clip_path)
+                filters.append(
+                    f"[{idx}:v]{conform},fps={fps},"
+                    f"trim=duration={dur},setpts=PTS-STARTPTS[{label}]"
+                )
+            else:
+                print(f"🚨 SCENE {scene['id']} MISSING! Generating Placeholder.")
+                idx = add_input("-f", "lavfi", "-t", dur, "-i",
+                                f"color=c={FFmpegRenderer.PLACEHOLDER_COLOR}:s={W}x{H}:r={fps}")
+                filters.append(f"[{idx}:v]setsar=1,trim=duration={dur},setpts=PTS-STARTPTS[{label}]")
+            scene_labels.append(f"[{label}]")
+
+        filters.append(f"{''.join(scene_labels)}concat=n={len(scene_labels)}:v=1:a=0[base]")
+        current = "base"
+
+        # 3. Overlay captions (pre-rasterized PNGs, enabled per scene window)
+        for i, (scene, start, duration) in enumerate(timeline):
+            txt = scene.get('overlay_text', '').upper()
+            if not txt:
+                continue
+            png_path = os.path.join(work_dir, f"caption_{i:03d}.png")
+            if not CaptionRenderer.save_png(png_path, txt, **CaptionRenderer.overlay_style(profile)):
+                continue
+            idx = add_input("-i", png_path)
+            end = start + duration
+            filters.append(
+                f"[{current}][{idx}:v]overlay=x=(W-w)/2:y=(H-h)/2"
+                f":enable='between(t,{start:.3f},{end:.3f})'[cap{i}]"
+            )
+            current = f"cap{i}"
+
+        # 4. Branding (logo wins over watermark, like the MoviePy path)
+        if assets.get('logo_path') and os.path.exists(assets['logo_path']):
+            opacity = blueprint.get('branding', {}).get('logo_opacity', 0.8)
+            idx = add_input("-i", assets['logo_path'])
+            filters.append(f"[{idx}:v]scale=-1:{px(150)},format=rgba,colorchannelmixer=aa={opacity}[logo]")
+            filters.append(f"[{current}][logo]overlay=x=W-w-{px(20)}:y={px(20)}[branded]")
+            current = "branded"
+        elif assets.get('watermark_text'):
+            png_path = os.path.join(work_dir, "watermark.png")
+            if CaptionRenderer.save_png(png_path, assets['watermark_text'], **CaptionRenderer.watermark_style(profile)):
+                idx = add_input("-i", png_path)
+                filters.append(f"[{current}][{idx}:v]overlay=x=(W-w)/2:y=H*0.92[branded]")
+                current = "branded"
+
+        filters.append(f"[{current}]format=yuv420p[vout]")
+
+        # 5. Audio: voice + music bed ducked under the voice (sidechain)
+        total = f"{master_duration:.3f}"
+        music_path = find_music_track(Config.MUSIC_DIR, assets.get('music_mood', 'Chill'))
+        if music_path:
+            print(f"🎵 Mixing Music: {os.path.basename(music_path)}")
+            music_idx = add_input("-stream_loop", "-1", "-i", music_path)
+            filters.append(f"[{voice_idx}:a]apad,atrim=duration={total},asplit=2[voice][sc]")
+            filters.append(f"[{music_idx}:a]atrim=duration={total},volume=0.10[bed]")
+            filters.append("[bed][sc]sidechaincompress=threshold=0.03:ratio=6:attack=20:release=400[ducked]")
+            filters.append("[voice][ducked]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[aout]")
+        else:
+            filters.append(f"[{voice_idx}:a]apad,atrim=duration={total}[aout]")
+
+        quality = ["-crf", str(profile['crf'])] if profile.get('crf') else []
+        return [arg for input_args in inputs for arg in input_args] + [
+            "-filter_complex", ";".join(filters),
+            "-map", "[vout]", "-map", "[aout]",
+            "-c:v", "libx264", "-preset", "ultrafast", *quality, "-r", str(fps),
+            "-c:a", "aac", "-ar", str(profile['audio_fps']), "-b:a", profile['audio_bitrate'],
+            "-t", total,
+            "-movflags", "+faststart",
+            output_path
+        ]
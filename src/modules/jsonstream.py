@@ -0,0 +1,108 @@
+import json
+
+_INVALID = object()
+
+class JsonStream:
+    """
+    Incremental scanner for one JSON object arriving in chunks (a streamed LLM reply).
+    feed() text as it comes in; callbacks fire as soon as a part is complete:
+      on_member(key, value)      -> a member of the root object ("script": {...})
+      on_item(key, index, value) -> an object/array element of a root-level array (scenes[i])
+    Text before the root '{' (markdown fences, chatter) and after its '}' is ignored.
+    Parts that don't parse are skipped; the caller still parses the whole text at the end.
+    """
+
+    def __init__(self, on_member=None, on_item=None):
+        self.on_member = on_member
+        self.on_item = on_item
+        self.text = ""
+        self.done = False         # Root object closed
+        self._pos = 0             # Next character to scan
+        self._stack = []          # Open containers: '{' / '['
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._pending_key = None  # Last string closed at depth 1 (a key once ':' follows)
+        self._key = None          # Root member currently being read
+        self._value_start = None
+        self._item_start = None
+        self._item_index = 0
+
+    def feed(self, chunk):
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            self._scan(text, i, text[i])
+        self._pos = len(text)
+
+    def _scan(self, text, i, c):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == '\\':
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if len(self._stack) == 1 and self._key is None:
+                    self._pending_key = text[self._string_start:i + 1]
+            return
+
+        depth = len(self._stack)
+        if depth == 0:
+            if c == '{':
+                self._stack.append(c)
+            return
+
+        if depth == 1 and self._key is not None and self._value_start is None and not c.isspace():
+            self._value_start = i
+
+        if c == '"':
+            self._in_string = True
+            self._string_start = i
+        elif c in '{[':
+            if depth == 2 and self._stack[-1] == '[':
+                self._item_start = i
+            self._stack.append(c)
+        elif c in '}]':
+            if depth == 1:
+                # Root closes: flush a trailing scalar member
+                if self._value_start is not None:
+                    self._member(text[self._value_start:i])
+                self.done = True
+            self._stack.pop()
+            depth = len(self._stack)
+            if depth == 2 and self._stack[-1] == '[' and self._item_start is not None:
+                self._item(text[self._item_start:i + 1])
+            elif depth == 1 and self._value_start is not None:
+                self._member(text[self._value_start:i + 1])
+        elif depth == 1:
+            if c == ':' and self._pending_key is not None:
+                key = self._loads(self._pending_key)
+                self._key = None if key is _INVALID else key
+                self._pending_key = None
+            elif c == ',' and self._value_start is not None:
+                self._member(text[self._value_start:i])
+
+    def _member(self, fragment):
+        value = self._loads(fragment)
+        if value is not _INVALID and self.on_member:
+            self.on_member(self._key, value)
+        self._key = None
+        self._value_start = None
+        self._item_index = 0
+
+    def _item(self, fragment):
+        value = self._loads(fragment)
+        if value is not _INVALID and self.on_item:
+            self.on_item(self._key, self._item_index, value)
+        self._item_start = None
+        self._item_index += 1
+
+    @staticmethod
+    def _loads(fragment):
+        try:
+            return json.loads(fragment)
+        except ValueError:
+            return _INVALID
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import math
+import threading
+from src.config import Config
+from src.modules.utils import run_ffmpeg
+
+class LocalLibrary:
+    """
+    Offline stock-footage provider over a local directory tree (Config.LIBRARY_DIR).
+    The index (data/cache/library_index.json) stores per clip: tags, filename
+    and folder tokens, duration, resolution and a keyframe thumbnail. It is
+    updated incrementally: only new or changed files (size/mtime) are probed.
+    Lookups go through an in-memory inverted index, so a query resolves in
+    milliseconds without touching the network.
+
+    Probing is slow on a big library, so it never happens inside a lookup:
+    start_indexing() refreshes the index on a background thread at startup
+    (find() uses the index saved by the last run meanwhile), and
+    `python -m src.modules.library` refreshes it ahead of time.
+
+    Tags come from an optional sidecar next to the clip: clip.mp4 + clip.json
+    ({"tags": [...]}) or clip.txt (comma/space separated).
+    """
+
+    VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.webm', '.mkv')
+    STOPWORDS = {"a", "an", "the", "of", "and", "or", "in", "on", "at", "to", "for", "with",
+                 "by", "from", "is", "are", "into", "over", "under", "shot", "video", "clip",
+                 "footage", "stock", "vertical", "hd", "4k", "1080p"}
+    # Match weight per token source
+    WEIGHTS = {"tags": 3.0, "folders": 2.0, "name": 1.0}
+
+    # (entries, postings): relative path -> entry dict, token -> {relative path: weight}.
+    # Swapped as one tuple, so lookups never see a half-built index.
+    _index = None
+    _indexer = None
+    _lock = threading.Lock()    # Held while (re)building
+
+    @staticmethod
+    def tokenize(text):
+        """Lowercase word tokens with stopwords dropped and plurals folded ('cities' -> 'city')."""
+        tokens = []
+        for word in re.findall(r"[a-z0-9]+", str(text).lower()):
+            if word in LocalLibrary.STOPWORDS or word.isdigit() or len(word) < 2:
+                continue
+            if word.endswith("ies") and len(word) > 4:
+                word = word[:-3] + "y"
+            elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+                word = word[:-1]
+            tokens.append(word)
+        return tokens
+
+    @staticmethod
+    def find(query, min_duration=0.0, limit=1):
+        """
+        Best matching clips for a scene query, as absolute paths (best first).
+        Clips must cover at least half of the query's tokens; among similar
+        scores, clips long enough for the scene and already portrait win.
+        Returns [] until an index is loaded (see start_indexing).
+        """
+        if LocalLibrary._index is None:
+            return []
+
+        entries, all_postings = LocalLibrary._index
+        query_tokens = set(LocalLibrary.tokenize(query))
+        if not query_tokens or not entries:
+            return []
+
+        total = max(1, len(entries))
+        scores, matched = {}, {}
+        for token in query_tokens:
+            postings = all_postings.get(token)
+            if not postings:
+                continue
+            # Rare tokens say more about a clip than common ones
+            idf = math.log(1 + total / len(postings))
+            for rel_path, weight in postings.items():
+                scores[rel_path] = scores.get(rel_path, 0.0) + weight * idf
+                matched[rel_path] = matched.get(rel_path, 0) + 1
+
+        ranked = []
+        for rel_path, score in scores.items():
+            coverage = matched[rel_path] / len(query_tokens)
+            if coverage < 0.5:
+                continue
+            entry = entries[rel_path]
+            long_enough = (entry.get('duration') or 0) >= min_duration
+            portrait = (entry.get('height') or 0) >= (entry.get('width') or 0)
+            ranked.append((coverage * score * (1.0 if long_enough else 0.5) * (1.0 if portrait else 0.8), rel_path))
+
+        ranked.sort(reverse=True)
+        paths = [os.path.join(Config.LIBRARY_DIR, rel_path) for _, rel_path in ranked]
+        # The saved index may list clips deleted since the last run
+        return [path for path in paths if os.path.exists(path)][:limit]
+
+    @staticmethod
+    def start_indexing():
+        """
+        Loads the saved index and refreshes it on a background thread, once per
+        process (later calls are no-ops). Call at startup.
+        """
+        with LocalLibrary._lock:
+            if LocalLibrary._indexer is not None or not os.path.isdir(Config.LIBRARY_DIR):
+                return
+            saved = LocalLibrary._load_index()
+            if LocalLibrary._index is None and saved:
+                LocalLibrary._index = (saved, LocalLibrary._build_postings(saved))
+            LocalLibrary._indexer = threading.Thread(target=LocalLibrary.refresh, name="aura-library", daemon=True)
+            LocalLibrary._indexer.start()
+
+    @staticmethod
+    def refresh():
+        """Re-scans the library now (probing new/changed clips). False if there's no library."""
+        if not os.path.isdir(Config.LIBRARY_DIR):
+            return False
+        with LocalLibrary._lock:
+            entries = LocalLibrary._update_index()
+            LocalLibrary._index = (entries, LocalLibrary._build_postings(entries))
+        return bool(entries)
+
+    @staticmethod
+    def _update_index():
+        """Walks LIBRARY_DIR, probing only new/changed clips, and saves the index."""
+        index = LocalLibrary._load_index()
+        entries = {}
+        probed = 0
+
+        for root, _, files in os.walk(Config.LIBRARY_DIR):
+            for name in files:
+                if not name.lower().endswith(LocalLibrary.VIDEO_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, Config.LIBRARY_DIR).replace("\\", "/")
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                sidecar_mtime = LocalLibrary._sidecar_mtime(path)
+                old = index.get(rel_path)
+                if (old and old.get('size') == stat.st_size and old.get('mtime') == stat.st_mtime
+                        and old.get('sidecar_mtime') == sidecar_mtime):
+                    entries[rel_path] = old
+                    continue
+
+                entries[rel_path] = LocalLibrary._probe(path, rel_path, stat, sidecar_mtime)
+                probed += 1
+
+        if probed or len(entries) != len(index):
+            LocalLibrary._save_index(entries)
+        print(f"📚 LOCAL LIBRARY: {len(entries)} clips indexed ({probed} new/changed).")
+        return entries
+
+    @staticmethod
+    def _probe(path, rel_path, stat, sidecar_mtime):
+        """Reads duration/resolution and grabs a keyframe thumbnail for one clip."""
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sidecar_mtime": sidecar_mtime,
+            "tags": LocalLibrary._read_tags(path),
+            "folders": LocalLibrary.tokenize(" ".join(os.path.dirname(rel_path).split("/"))),
+            "name": LocalLibrary.tokenize(os.path.splitext(os.path.basename(path))[0]),
+            "duration": None, "width": None, "height": None, "thumb": None,
+        }
+        try:
+            from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+            infos = ffmpeg_parse_infos(path)
+            entry['duration'] = infos.get('duration')
+            entry['width'], entry['height'] = infos.get('video_size') or (None, None)
+        except Exception as e:
+            print(f"⚠️ Library probe failed ({rel_path}): {e}")
+            return entry
+
+        os.makedirs(Config.LIBRARY_THUMB_DIR, exist_ok=True)
+        thumb_name = re.sub(r"[^A-Za-z0-9_.-]", "_", rel_path) + ".jpg"
+        thumb_path = os.path.join(Config.LIBRARY_THUMB_DIR, thumb_name)
+        seek = (entry['duration'] or 0) / 2
+        if run_ffmpeg(["-ss", f"{seek:.2f}", "-i", path, "-frames:v", "1", "-vf", "scale=270:-2", thumb_path],
+                      label=f"Library thumbnail {rel_path}"):
+            entry['thumb'] = thumb_path
+        return entry
+
+    @staticmethod
+    def _sidecar_mtime(path):
+        base = os.path.splitext(path)[0]
+        for ext in (".json", ".txt"):
+            if os.path.exists(base + ext):
+                return os.path.getmtime(base + ext)
+        return None
+
+    @staticmethod
+    def _read_tags(path):
+        base = os.path.splitext(path)[0]
+        try:
+            if os.path.exists(base + ".json"):
+                with open(base + ".json", "r", encoding="utf-8") as f:
+                    return LocalLibrary.tokenize(" ".join(json.load(f).get("tags", [])))
+            if os.path.exists(base + ".txt"):
+                with open(base + ".txt", "r", encoding="utf-8") as f:
+                    return LocalLibrary.tokenize(f.read())
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ Library tags unreadable ({os.path.basename(path)}): {e}")
+        return []
+
+    @staticmethod
+    def _build_postings(entries):
+        postings = {}
+        for rel_path, entry in entries.items():
+            for source, weight in LocalLibrary.WEIGHTS.items():
+                for token in entry.get(source, []):
+                    slot = postings.setdefault(token, {})
+                    # A token counts once per clip, at its strongest source
+                    slot[rel_path] = max(slot.get(rel_path, 0.0), weight)
+        return postings
+
+    @staticmethod
+    def _load_index():
+        try:
+            with open(Config.LIBRARY_INDEX_PATH, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("root") == os.path.abspath(Config.LIBRARY_DIR):
+                return index.get("clips", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    @staticmethod
+    def _save_index(entries):
+        os.makedirs(os.path.dirname(Config.LIBRARY_INDEX_PATH), exist_ok=True)
+        tmp_path = Config.LIBRARY_INDEX_PATH + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"root": os.path.abspath(Config.LIBRARY_DIR), "clips": entries}, f)
+            os.replace(tmp_path, Config.LIBRARY_INDEX_PATH)
+        except OSError as e:
+            print(f"⚠️ Library index not saved: {e}")
+
+
+if __name__ == "__main__":
+    # python -m src.modules.library  (index new/changed clips before a run)
+    if not LocalLibrary.refresh():
+        print(f"📚 LOCAL LIBRARY: No clips found in {Config.LIBRARY_DIR}.")
@@ -0,0 +1,279 @@
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from src.config import Config
+
+class HttpClient:
+    """
+    Shared HTTP layer for every outbound call (Pexels, Euron, Pollinations, Euri).
+    - One requests.Session with keep-alive pools sized for the worker threads,
+      so each host pays the TCP+TLS handshake once per process, not per request.
+    - Default timeouts on every call.
+    - Jittered exponential backoff on 429/5xx and connection errors, honoring Retry-After.
+    - A per-host concurrency cap so parallel scenes don't trip rate limits.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    # POSTs (paid generations) are only repeated when the server clearly didn't process them
+    POST_RETRY_STATUSES = {429, 502, 503, 504}
+
+    _session = None
+    _session_lock = threading.Lock()
+    _host_slots = {}
+    _host_slots_lock = threading.Lock()
+
+    @staticmethod
+    def session():
+        """The process-wide pooled session (created on first use)."""
+        with HttpClient._session_lock:
+            if HttpClient._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=Config.HTTP_POOL_HOSTS,
+                    pool_maxsize=Config.HTTP_POOL_SIZE,
+                    pool_block=True,   # Wait for a free connection instead of opening throwaway ones
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                HttpClient._session = session
+            return HttpClient._session
+
+    @staticmethod
+    def host_slot(url):
+        """Semaphore capping concurrent transfers to url's host (HTTP_HOST_LIMITS, else HTTP_MAX_PER_HOST)."""
+        host = urlsplit(url).netloc.lower()
+        with HttpClient._host_slots_lock:
+            if host not in HttpClient._host_slots:
+                limit = Config.HTTP_HOST_LIMITS.get(host.split(":")[0], Config.HTTP_MAX_PER_HOST)
+                HttpClient._host_slots[host] = threading.BoundedSemaphore(limit)
+            return HttpClient._host_slots[host]
+
+    @staticmethod
+    def request(method, url, retries=None, **kwargs):
+        """
+        Sends a request with pooling, timeouts and retries.
+        Returns the final Response (possibly non-2xx once retries are exhausted).
+        Raises requests.RequestException if the host never answered.
+        With stream=True the caller must close the response (use it as a context manager).
+        """
+        retries = Config.HTTP_RETRIES if retries is None else retries
+        kwargs.setdefault("timeout", Config.HTTP_TIMEOUT)
+        method = method.upper()
+        retry_statuses = HttpClient.POST_RETRY_STATUSES if method == "POST" else HttpClient.RETRY_STATUSES
+        host = urlsplit(url).netloc
+
+        for attempt in range(retries + 1):
+            try:
+                with HttpClient.host_slot(url):
+                    response = HttpClient.session().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A read timeout on a POST may already have been processed (and billed)
+                if attempt >= retries or (method == "POST" and isinstance(e, requests.ReadTimeout)):
+                    raise
+                delay = HttpClient._backoff(attempt)
+                print(f"🔁 HTTP {host}: {type(e).__name__}, retry {attempt + 1}/{retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in retry_statuses:
+                return response
+
+            delay = HttpClient._retry_after(response)
+            if delay is None:
+                delay = HttpClient._backoff(attempt)
+            if attempt >= retries or delay > Config.HTTP_RETRY_AFTER_MAX:
+                print(f"⚠️ HTTP {response.status_code} from {host} after {attempt + 1} attempt(s).")
+                return response
+
+            print(f"🔁 HTTP {response.status_code} from {host}, retry {attempt + 1}/{retries} in {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
+
+    @staticmethod
+    def get(url, **kwargs):
+        return HttpClient.request("GET", url, **kwargs)
+
+    @staticmethod
+    def post(url, **kwargs):
+        return HttpClient.request("POST", url, **kwargs)
+
+    @staticmethod
+    def download(url, save_path, chunk_size=1024 * 1024, cancel=None, **kwargs):
+        """
+        Streams url to save_path (write to .part, then rename).
+        Returns save_path or None on failure. Retries cover the whole transfer.
+        Setting the `cancel` event (threading.Event) aborts the transfer.
+        """
+        tmp_path = f"{save_path}.part"
+        for attempt in range(Config.HTTP_RETRIES + 1):
+            try:
+                with HttpClient.get(url, stream=True, **kwargs) as r:
+                    r.raise_for_status()
+                    # Hold the host slot while the body streams, not just for the headers
+                    with HttpClient.host_slot(url), open(tmp_path, "wb") as f:
+                        for chunk in r.iter_content(chunk_size=chunk_size):
+                            if cancel is not None and cancel.is_set():
+                                raise InterruptedError("download cancelled")
+                            f.write(chunk)
+                os.replace(tmp_path, save_path)
+                return save_path
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # Connection dropped mid-body: start the transfer over
+                if attempt >= Config.HTTP_RETRIES:
+                    print(f"⚠️ Download failed ({urlsplit(url).netloc}): {e}")
+                    break
+                time.sleep(HttpClient._backoff(attempt))
+            except InterruptedError:
+                break
+            except (requests.RequestException, OSError) as e:
+                print(f"⚠️ Download failed ({urlsplit(url).netloc}): {e}")
+                break
+
+        if os.path.exists(tmp_path):
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+        return None
+
+    @staticmethod
+    def _backoff(attempt):
+        """Jittered exponential backoff: uniform(cap / 4, cap) with cap = base * 2^attempt (bounded)."""
+        ceiling = min(Config.HTTP_BACKOFF_MAX, Config.HTTP_BACKOFF * (2 ** attempt))
+        return random.uniform(ceiling / 4, ceiling)
+
+    @staticmethod
+    def _retry_after(response):
+        """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+
+class RateLimitBudget:
+    """
+    Client-side quota tracker for APIs that report X-Ratelimit-* headers (Pexels).
+    - While plenty of quota is left, calls go straight through.
+    - Once Remaining drops below spread_below, calls are spaced evenly over the
+      time left until Reset, so the quota lasts until it refills.
+    - When the quota is gone, callers wait for the reset if it is close
+      (max_wait seconds) and are told to skip the call otherwise.
+    """
+
+    def __init__(self, name, spread_below=50, reserve=0, max_wait=10.0):
+        self.name = name
+        self.spread_below = spread_below
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None       # Unix time when the window refills
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until the next call may go out. Returns False if it should be skipped."""
+        with self._lock:
+            now = time.time()
+            if self.reset_at is not None and now >= self.reset_at:
+                # Window refilled: forget the old numbers until the next response
+                self.remaining, self.reset_at = None, None
+
+            if self.remaining is None:
+                return True
+
+            if self.remaining <= self.reserve:
+                wait = (self.reset_at or now) - now
+                if wait > self.max_wait:
+                    print(f"⏳ {self.name} quota exhausted (resets in {wait:.0f}s). Skipping call.")
+                    return False
+                self._next_slot = max(self._next_slot, now + wait)
+            elif self.remaining < self.spread_below and self.reset_at:
+                # Spread what's left evenly over the rest of the window
+                interval = (self.reset_at - now) / (self.remaining - self.reserve)
+                self._next_slot = max(self._next_slot, now)
+                if self._next_slot - now > self.max_wait:
+                    print(f"⏳ {self.name} quota low ({self.remaining} left). Deferring call.")
+                    return False
+                slot, self._next_slot = self._next_slot, self._next_slot + interval
+                self.remaining -= 1
+                wait = slot - now
+            else:
+                self.remaining -= 1   # Optimistic: other threads see the spend before the reply
+                return True
+
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def update(self, response):
+        """Reads the X-Ratelimit-Limit / -Remaining / -Reset headers of a response."""
+        headers = response.headers
+        try:
+            with self._lock:
+                if "X-Ratelimit-Limit" in headers:
+                    self.limit = int(headers["X-Ratelimit-Limit"])
+                if "X-Ratelimit-Remaining" in headers:
+                    self.remaining = int(headers["X-Ratelimit-Remaining"])
+                if "X-Ratelimit-Reset" in headers:
+                    self.reset_at = float(headers["X-Ratelimit-Reset"])
+                if response.status_code == 429 and self.remaining is None:
+                    self.remaining = 0
+                    retry_after = HttpClient._retry_after(response)
+                    self.reset_at = time.time() + (retry_after if retry_after is not None else 60)
+        except ValueError:
+            pass
+
+
+class TokenBucket:
+    """
+    Client-side per-minute limiter (requests or tokens).
+    The bucket holds up to `per_minute` units and refills continuously;
+    acquire(n) blocks until n units are available. Units reserved for a call
+    that used less (e.g. max_tokens vs. the actual reply) can be refunded.
+    """
+
+    def __init__(self, name, per_minute):
+        self.name = name
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        amount = min(float(amount), self.capacity)   # One oversized call must still fit eventually
+        announced = False
+        while True:
+            with self._lock:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) * 60.0 / self.capacity
+            if not announced and wait > 1:
+                print(f"⏳ {self.name} limit reached. Waiting {wait:.1f}s...")
+                announced = True
+            time.sleep(wait)
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill()
+            self.available = min(self.capacity, self.available + max(0.0, amount))
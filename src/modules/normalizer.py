@@ -0,0 +1,63 @@
+import os
+from PIL import Image, ImageOps
+from src.config import Config
+from src.modules.utils import run_ffmpeg
+
+class MediaNormalizer:
+    """
+    Ingest-time conform step.
+    Transcodes every downloaded asset ONCE into a 9:16 1080x1920 @ FPS proxy
+    (trimmed to the scene length) so the editor can pass it through untouched
+    instead of cropping/resizing every frame at render time.
+    """
+
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+    @staticmethod
+    def normalize(path, duration=None):
+        """
+        Returns the path of the conformed proxy.
+        On any failure the original file is returned so the editor can still conform it.
+        """
+        if not path or not os.path.exists(path):
+            return path
+
+        base, ext = os.path.splitext(path)
+        if ext.lower() in MediaNormalizer.IMAGE_EXTENSIONS:
+            return MediaNormalizer._normalize_image(path, f"{base}_proxy.jpg")
+        return MediaNormalizer._normalize_video(path, f"{base}_proxy.mp4", duration)
+
+    @staticmethod
+    def _normalize_video(path, proxy_path, duration):
+        W, H, fps = Config.VIDEO_WIDTH, Config.VIDEO_HEIGHT, Config.FPS
+
+        args = []
+        if duration:
+            args += ["-t", f"{duration:.3f}"]
+        args += [
+            "-i", path,
+            "-vf", f"scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},setsar=1,fps={fps}",
+            "-an",
+            "-c:v", "libx264", "-preset", "ultrafast", "-tune", "fastdecode", "-crf", "18",
+            # Short GOP + no B-frames = cheap seeks/subclips in the editor
+            "-g", str(Config.PROXY_GOP), "-bf", "0",
+            "-pix_fmt", "yuv420p",
+            proxy_path
+        ]
+
+        if run_ffmpeg(args, label=f"Normalize {os.path.basename(path)}"):
+            return proxy_path
+        return path
+
+    @staticmethod
+    def _normalize_image(path, proxy_path):
+        try:
+            with Image.open(path) as img:
+                img = ImageOps.exif_transpose(img).convert("RGB")
+                # Center-crop to 9:16 and resize in one step
+                img = ImageOps.fit(img, (Config.VIDEO_WIDTH, Config.VIDEO_HEIGHT), Image.LANCZOS)
+                img.save(proxy_path, quality=95)
+            return proxy_path
+        except Exception as e:
+            print(f"⚠️ Normalize Error ({os.path.basename(path)}): {e}")
+            return path
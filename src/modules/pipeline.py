@@ -0,0 +1,274 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.config import Config
+from src.modules.voice import VoiceEngine
+from src.modules.assets import AssetEngine
+from src.modules.planner import AssetPlanner
+from src.modules.schema import BlueprintSchema
+
+class Pipeline:
+    """
+    Small DAG scheduler for the production stages.
+    Every stage starts as soon as the stages it depends on have finished, so
+    independent work (voice synthesis, per-scene downloads, normalization)
+    overlaps instead of running phase by phase.
+
+    A stage is called with its dependencies' results as positional arguments.
+    Stages may add() new stages while the pipeline runs. A stage that raises
+    is marked failed and everything downstream of it is skipped.
+    Events are delivered on the thread that called run() (safe for Streamlit).
+    """
+
+    def __init__(self, max_workers=None, on_event=None):
+        self.max_workers = max_workers or Config.PIPELINE_WORKERS
+        self.on_event = on_event      # on_event(event, stage_name, seconds): "start" | "done" | "failed" | "skipped"
+        self.results = {}
+        self.timings = {}             # name -> (start offset, seconds), relative to run()
+        self.failed = set()
+        self._stages = {}             # name -> (func, after)
+        self._pending = []            # names not yet submitted, in insertion order
+        self._lock = threading.Lock()
+        self._wakeup = None           # Resolved by add() so a running pipeline schedules new stages at once
+        self._t0 = None
+
+    def add(self, name, func, after=()):
+        """Registers a stage. Thread-safe; may be called from inside a running stage."""
+        with self._lock:
+            if name in self._stages:
+                raise ValueError(f"Duplicate pipeline stage: {name}")
+            self._stages[name] = (func, tuple(after))
+            self._pending.append(name)
+            if self._wakeup is not None and not self._wakeup.done():
+                self._wakeup.set_result(None)
+        return name
+
+    def has_stage(self, name):
+        with self._lock:
+            return name in self._stages
+
+    def run(self):
+        """Runs every stage to completion. Returns {stage name: result}."""
+        self._t0 = time.perf_counter()
+        self._wakeup = Future()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                for name, event in self._collect_ready():
+                    if event == "skipped":
+                        self._emit("skipped", name, 0.0)
+                        continue
+                    func, after = self._stages[name]
+                    args = [self.results[dep] for dep in after]
+                    running[executor.submit(self._run_stage, name, func, args)] = name
+                    self._emit("start", name, 0.0)
+
+                if not running:
+                    break
+
+                done, _ = wait([*running, self._wakeup], return_when=FIRST_COMPLETED)
+                with self._lock:
+                    if self._wakeup.done():
+                        self._wakeup = Future()
+                for future in done:
+                    if future not in running:
+                        continue
+                    name = running.pop(future)
+                    ok, result = future.result()
+                    seconds = self.timings[name][1]
+                    if ok:
+                        self.results[name] = result
+                        self._emit("done", name, seconds)
+                    else:
+                        self.failed.add(name)
+                        self._emit("failed", name, seconds)
+
+        with self._lock:
+            self._wakeup = None
+            # Dependencies that were never registered
+            for name in self._pending:
+                print(f"⚠️ Pipeline: '{name}' never ran (missing dependency).")
+                self.failed.add(name)
+        return self.results
+
+    def _collect_ready(self):
+        """Pops stages whose dependencies are all finished (or one of them failed)."""
+        ready = []
+        with self._lock:
+            for name in list(self._pending):
+                after = self._stages[name][1]
+                if any(dep in self.failed for dep in after):
+                    self._pending.remove(name)
+                    self.failed.add(name)
+                    ready.append((name, "skipped"))
+                elif all(dep in self.results for dep in after):
+                    self._pending.remove(name)
+                    ready.append((name, "submit"))
+        return ready
+
+    def _run_stage(self, name, func, args):
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+            ok = True
+        except Exception as e:
+            print(f"❌ Pipeline stage '{name}' failed: {e}")
+            result, ok = None, False
+        end = time.perf_counter()
+        self.timings[name] = (start - self._t0, end - start)
+        return ok, result
+
+    def _emit(self, event, name, seconds):
+        if self.on_event:
+            try:
+                self.on_event(event, name, seconds)
+            except Exception as e:
+                print(f"⚠️ Pipeline event handler error: {e}")
+
+    def report(self):
+        """Prints per-stage timings (start offset + duration) and the wall-clock total."""
+        if not self.timings:
+            return
+        print("⏱️ PIPELINE TIMINGS:")
+        for name, (start, seconds) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            print(f"   {name:<24} +{start:6.2f}s  {seconds:6.2f}s")
+        wall = max(start + seconds for start, seconds in self.timings.values())
+        busy = sum(seconds for _, seconds in self.timings.values())
+        print(f"   {'total (wall)':<24} {wall:7.2f}s  ({busy:.2f}s of stage work)")
+
+
+class ProductionPlan:
+    """
+    The blueprint, voice + asset stages shared by the CLI (main.py) and the Studio (app.py).
+    Adds to a Pipeline:
+      blueprint        -> the blueprint
+      voice            -> {"audio_path", "scene_durations", "word_timings"}
+      fetch:<id>       -> downloaded/generated file for one scene
+      normalize:<id>   -> render-ready proxy for that scene (starts as soon as its fetch lands)
+      assets           -> {scene_id: path}
+    Render stages go after ("blueprint", "voice", "assets").
+    """
+
+    @staticmethod
+    def add_streaming_stages(pipeline, generate, audio_path, voice_name="Nova (Female)", use_ai_images=False,
+                             normalize=None):
+        """
+        Plans the production from the LLM call itself.
+        generate(on_section) -> blueprint or None (Brain.generate_video_blueprint with on_section).
+        The voice stage is added as soon as the script section arrives and each
+        scene's fetch/normalize stages as soon as that scene does, while the model
+        is still writing the rest. Returns ("blueprint", "voice", "assets").
+        A blueprint that can't be completed (e.g. the stream broke off and no engine
+        could supply the rest) fails the blueprint stage, so nothing is rendered
+        from the scenes that already started.
+        """
+        if normalize is None:
+            normalize = Config.NORMALIZE_ASSETS
+
+        def run_brain():
+            planning, scene_ids, asset_stages = AssetPlanner.new_job(), [], []
+            speech = {}     # "seconds": estimated voiceover length, bounds how much of a clip is kept
+
+            def on_section(section, value):
+                if section == "script":
+                    speech['seconds'] = BlueprintSchema.speech_seconds(value.get('full_voiceover'))
+                if (section == "script" and Config.VOICE_MODE != "scenes" and value.get('full_voiceover')
+                        and not pipeline.has_stage("voice")):
+                    pipeline.add("voice", lambda: ProductionPlan.synthesize_voice({"script": value}, audio_path,
+                                                                                   voice_name))
+                elif section == "scene" and value.get('id') not in scene_ids:
+                    plan = None if use_ai_images else AssetPlanner.assign(planning, value)
+                    asset_stages.append(ProductionPlan._add_scene_stages(pipeline, value, use_ai_images,
+                                                                         normalize, plan, speech))
+                    scene_ids.append(value.get('id'))
+
+            blueprint = generate(on_section)
+            if not blueprint:
+                raise RuntimeError("blueprint generation failed")
+            speech['seconds'] = BlueprintSchema.speech_seconds(blueprint['script'].get('full_voiceover'))
+
+            if not pipeline.has_stage("voice"):
+                # Per-scene voice needs every scene (or the script never streamed on its own)
+                pipeline.add("voice", lambda: ProductionPlan.synthesize_voice(blueprint, audio_path, voice_name))
+            for scene in blueprint.get('scenes', []):
+                # Scenes the stream couldn't parse on their own
+                if scene.get('id') not in scene_ids:
+                    asset_stages.append(ProductionPlan._add_scene_stages(pipeline, scene, use_ai_images, normalize,
+                                                                         None if use_ai_images
+                                                                         else AssetPlanner.assign(planning, scene),
+                                                                         speech))
+                    scene_ids.append(scene.get('id'))
+            ProductionPlan._add_assets_stage(pipeline, scene_ids, asset_stages)
+            return blueprint
+
+        pipeline.add("blueprint", run_brain)
+        return "blueprint", "voice", "assets"
+
+    @staticmethod
+    def _add_scene_stages(pipeline, scene, use_ai_images, normalize, plan, speech):
+        """
+        fetch:<id> (+ normalize:<id>) for one scene. Returns the name of its last stage.
+        Both stages share one Config.ASSET_DEADLINE, counted from when the scene
+        gets one of the AssetEngine.scene_slots.
+        speech: the job's {"seconds": estimated voiceover length}, read when the stage runs.
+        """
+        clock = {}
+        fetch = pipeline.add(f"fetch:{scene['id']}",
+                             lambda: ProductionPlan._fetch(scene, use_ai_images, plan, clock, speech.get('seconds')))
+        if normalize:
+            fetch = pipeline.add(f"normalize:{scene['id']}",
+                                 lambda path: ProductionPlan._normalize(scene, path, clock, speech.get('seconds')),
+                                 after=[fetch])
+        return fetch
+
+    @staticmethod
+    def _add_assets_stage(pipeline, scene_ids, asset_stages):
+        pipeline.add("assets", lambda *paths: {sid: p for sid, p in zip(scene_ids, paths) if p},
+                     after=asset_stages)
+
+    @staticmethod
+    def synthesize_voice(blueprint, audio_path, voice_name):
+        """
+        Per-scene synthesis when Config.VOICE_MODE == "scenes", the full voiceover sentence by
+        sentence otherwise (and as fallback). Both cache every part, so script edits only
+        re-synthesize the sentences/scenes that changed.
+        word_timings is the edge-tts word map for the whole track (VideoEditor cuts on it).
+        """
+        if Config.VOICE_MODE == "scenes":
+            # Per-scene synthesis: cuts land exactly where each scene's narration ends
+            voice_result = VoiceEngine.generate_scene_audio(blueprint.get('scenes', []), audio_path, voice_name=voice_name)
+            if voice_result:
+                return {"audio_path": audio_path, **voice_result}
+
+        script_text = blueprint.get('script', {}).get('full_voiceover')
+        word_timings = VoiceEngine.synthesize(script_text, audio_path, voice_name=voice_name) if script_text else None
+        if word_timings is None:
+            raise RuntimeError("voice synthesis failed")
+        return {"audio_path": audio_path, "scene_durations": None, "word_timings": word_timings}
+
+    @staticmethod
+    def _fetch(scene, use_ai_images, plan=None, clock=None, script_seconds=None):
+        # One scene failing (or hanging past Config.ASSET_DEADLINE) must not skip the render:
+        # it gets a placeholder instead
+        with AssetEngine.scene_slots:
+            if clock is not None:
+                clock['started'] = time.monotonic()
+            try:
+                return AssetEngine.run_with_deadline(AssetEngine.fetch_scene_asset, scene, use_ai_images, plan,
+                                                     script_seconds)
+            except Exception as e:
+                print(f"⚠️ Failed to process scene {scene.get('id')}: {e}")
+                return None
+
+    @staticmethod
+    def _normalize(scene, path, clock, script_seconds=None):
+        """Proxy for a fetched asset within what's left of the scene's deadline (raw asset if it runs out)."""
+        if not path:
+            return None
+        remaining = Config.ASSET_DEADLINE - (time.monotonic() - clock.get('started', time.monotonic()))
+        if remaining <= 0:
+            print(f"⏰ Scene {scene.get('id')} has no deadline left to conform. Using the raw asset.")
+            return path
+        return AssetEngine.run_with_deadline(AssetEngine.normalize_scene_asset, scene, path, script_seconds,
+                                             deadline=remaining) or path
@@ -0,0 +1,73 @@
+import threading
+from src.config import Config
+from src.modules.library import LocalLibrary
+
+class AssetPlanner:
+    """
+    Planning step run as each scene arrives, before its download.
+    Scene queries are normalized to token sets and clustered by overlap
+    ("coding laptop" ~ "laptop coding screen"), so each cluster costs ONE
+    stock search with a larger per_page, and its scenes take distinct results
+    (rank 0, 1, 2...) instead of downloading the same clip twice.
+    claim() keeps clips distinct across clusters too: a result another scene
+    of the job already took is skipped.
+    """
+
+    @staticmethod
+    def new_job():
+        """Planning state for one job: its query clusters and the clips already handed out."""
+        return {"clusters": [], "taken": set(), "lock": threading.Lock()}
+
+    @staticmethod
+    def assign(job, scene):
+        """
+        Places one scene as it arrives (job from new_job()). A cluster's first
+        query is its search, since that search may already be running, and
+        per_page is the maximum because the cluster's final size isn't known yet.
+        Returns the scene's plan entry {"query", "rank", "per_page", "job"},
+        or None without a visual query.
+        """
+        query = scene.get('visual', {}).get('query')
+        tokens = set(LocalLibrary.tokenize(query or ""))
+        if not tokens:
+            return None
+
+        with job['lock']:
+            cluster = AssetPlanner._find_cluster(job['clusters'], tokens)
+            if cluster is None:
+                cluster = {"tokens": tokens, "scenes": []}
+                job['clusters'].append(cluster)
+            cluster['scenes'].append((scene['id'], query))
+            return {"query": cluster['scenes'][0][1], "rank": len(cluster['scenes']) - 1,
+                    "per_page": Config.PEXELS_MAX_PER_PAGE, "job": job}
+
+    @staticmethod
+    def claim(plan, clip_id):
+        """
+        Reserves a clip (Pexels video id, library path) for the scene planned by plan.
+        False if another scene of the same job already has it. Scenes without a
+        job plan can take anything.
+        """
+        job = (plan or {}).get('job')
+        if job is None:
+            return True
+        with job['lock']:
+            if clip_id in job['taken']:
+                return False
+            job['taken'].add(clip_id)
+            return True
+
+    @staticmethod
+    def _find_cluster(clusters, tokens):
+        return next((c for c in clusters
+                     if AssetPlanner.similarity(c['tokens'], tokens) >= Config.QUERY_CLUSTER_SIMILARITY), None)
+
+    @staticmethod
+    def similarity(a, b):
+        """Overlap of two token sets: Jaccard, or full containment of the shorter query."""
+        if not a or not b:
+            return 0.0
+        shared = len(a & b)
+        if shared == min(len(a), len(b)):
+            return 1.0
+        return shared / len(a | b)
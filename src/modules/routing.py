@@ -0,0 +1,391 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.config import Config
+
+# Runs hedged provider calls (kept alive for the process: losers may still be finishing)
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=Config.HEDGE_WORKERS, thread_name_prefix="aura-hedge")
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls go through; `failure_threshold` failures in a row open it.
+    open      -> calls are refused until `cooldown` seconds have passed.
+    half-open -> one trial call; success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=None, cooldown=None):
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURES
+        self.cooldown = cooldown or Config.BREAKER_COOLDOWN
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.time() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        """True if a call may go out now (claims the single half-open trial)."""
+        return self.claim() is not None
+
+    def claim(self):
+        """Like allow(), but says what was granted: "call", "trial" (the half-open trial) or None."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "call"
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return "trial"
+            return None
+
+    def release(self):
+        """Hands back a claimed half-open trial that ended without an outcome (cancelled call)."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+            self._trial_running = False
+
+
+class ProviderStats:
+    """
+    Rolling latency/error window for one provider (process-wide, by name),
+    plus the circuit breaker those numbers drive. Streamed calls (raced_stream)
+    also record their time to first output.
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, name, window=None):
+        self.name = name
+        self.latencies = deque(maxlen=window or Config.PROVIDER_STATS_WINDOW)  # successful calls, seconds
+        self.outcomes = deque(maxlen=window or Config.PROVIDER_STATS_WINDOW)   # True = success
+        self.first_outputs = deque(maxlen=window or Config.PROVIDER_STATS_WINDOW)  # streamed calls, seconds
+        self.breaker = CircuitBreaker()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_provider(cls, name):
+        with cls._registry_lock:
+            if name not in cls._registry:
+                cls._registry[name] = cls(name)
+            return cls._registry[name]
+
+    @classmethod
+    def snapshot_all(cls):
+        with cls._registry_lock:
+            providers = list(cls._registry.values())
+        return {p.name: p.snapshot() for p in providers}
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.outcomes.append(True)
+        self.breaker.record_success()
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(False)
+        self.breaker.record_failure()
+
+    def record_first_output(self, seconds):
+        with self._lock:
+            self.first_outputs.append(seconds)
+
+    def percentile(self, q, first_output=False):
+        """
+        q-quantile (0..1) of recent successful latencies (or times to first output),
+        or None with too few samples.
+        """
+        with self._lock:
+            samples = sorted(self.first_outputs if first_output else self.latencies)
+        if len(samples) < Config.PROVIDER_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def error_rate(self):
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self):
+        snapshot = {
+            "calls": len(self.outcomes),
+            "error_rate": round(self.error_rate(), 3),
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "breaker": self.breaker.state,
+        }
+        if self.first_outputs:
+            snapshot["first_output_p50"] = self.percentile(0.5, first_output=True)
+        return snapshot
+
+
+def _tracked(name, func, cancel, trial=False):
+    """
+    Runs func(cancel) and records the outcome. Calls cut short by a cancel aren't
+    counted, but give back the half-open trial they held (trial=True).
+    """
+    stats = ProviderStats.for_provider(name)
+    start = time.perf_counter()
+    try:
+        result = func(cancel)
+    except Exception as e:
+        print(f"⚠️ {name} failed: {e}")
+        result = None
+    if cancel.is_set():
+        if trial:
+            stats.breaker.release()
+    elif result:
+        stats.record_success(time.perf_counter() - start)
+    else:
+        stats.record_failure()
+    return result
+
+
+def hedged_call(primary, secondary, hedge_after=None, on_discard=None):
+    """
+    Runs provider `primary` and, if it hasn't answered after `hedge_after`
+    seconds (default: its learned HEDGE_PERCENTILE latency), `secondary` in
+    parallel. The first truthy result wins and the other call is told to stop.
+    A failed call hands over to the other one immediately. Providers whose
+    circuit breaker is open are skipped.
+
+    primary / secondary: (name, func) with func(cancel_event) -> result or None.
+    on_discard(result) cleans up a loser that finished anyway.
+    Returns (result, provider name), or (None, None) if both failed.
+    """
+    candidates = [p for p in (primary, secondary) if p]
+    providers = [p for p in candidates if ProviderStats.for_provider(p[0]).breaker.state != "open"]
+    # Every breaker is open: still try once in preference order rather than give up
+    forced = not providers
+    providers = providers or candidates
+    if not providers:
+        return None, None
+
+    cancels = {}
+    running = {}
+    backups = list(providers)
+
+    def launch_next():
+        """Starts the next provider whose breaker lets a call out (the half-open trial is claimed here)."""
+        while backups:
+            name, func = backups.pop(0)
+            grant = ProviderStats.for_provider(name).breaker.claim()
+            if grant is None and not forced:
+                continue   # Its half-open trial is already running elsewhere
+            cancels[name] = threading.Event()
+            running[_HEDGE_POOL.submit(_tracked, name, func, cancels[name], grant == "trial")] = name
+            return name
+        return None
+
+    first = launch_next()
+    if first is None:
+        return None, None
+
+    if hedge_after is None:
+        learned = ProviderStats.for_provider(first).percentile(Config.HEDGE_PERCENTILE)
+        hedge_after = Config.HEDGE_DEFAULT_DELAY if learned is None else max(Config.HEDGE_MIN_DELAY, learned)
+    timeout = hedge_after
+
+    while running:
+        done, _ = wait(running, timeout=timeout if backups else None, return_when=FIRST_COMPLETED)
+        if not done:
+            # Primary is slower than usual: hedge with the backup
+            print(f"🏁 {first} slower than {hedge_after:.1f}s. Hedging with {backups[0][0]}...")
+            launch_next()
+            continue
+
+        for future in done:
+            name = running.pop(future)
+            result = future.result()
+            if result:
+                for other_future, other in running.items():
+                    cancels[other].set()
+                    if on_discard:
+                        other_future.add_done_callback(
+                            lambda f: f.result() and on_discard(f.result())
+                        )
+                return result, name
+
+        # The call that finished failed: start the backup right away (if not already running)
+        launch_next()
+
+    return None, None
+
+
+class StreamTicket:
+    """
+    One call's handle in raced_stream.
+    sent()  -> the request is going out now (client-side rate-limit waits are over);
+               latency and the hedge timer count from here.
+    lost()  -> another call already owns the stream: don't send / stop reading.
+    claim() -> called before the first output is passed on; True if this call
+               now owns the stream, False if it lost.
+    """
+
+    def __init__(self, name, race):
+        self.name = name
+        self.sent_at = None
+        self._race = race
+        self._sent = Future()
+
+    def sent(self):
+        if self.sent_at is None:
+            self.sent_at = time.perf_counter()
+            self._sent.set_result(None)
+
+    def elapsed(self):
+        return 0.0 if self.sent_at is None else time.perf_counter() - self.sent_at
+
+    def lost(self):
+        with self._race['lock']:
+            return bool(self._race['owner']) and self._race['owner'][0] != self.name
+
+    def claim(self):
+        with self._race['lock']:
+            owner = self._race['owner']
+            if not owner:
+                owner.append(self.name)
+                ProviderStats.for_provider(self.name).record_first_output(self.elapsed())
+            return owner[0] == self.name
+
+
+def raced_stream(primary, secondary=None, hedge_after=None):
+    """
+    Streaming counterpart of hedged_call, for calls whose output is used as it arrives.
+    primary / secondary: (name, func) with func(ticket) -> result (see StreamTicket).
+    The first call to claim() owns the stream; the other one has lost and stops.
+    `secondary` is raced in when nobody has claimed `hedge_after` seconds after the
+    primary's request was sent (default: its learned LLM_HEDGE_PERCENTILE time to
+    first output), or at once when the primary fails before producing anything.
+
+    Returns {"name", "result", "error", "seconds", "launched", "failed"}: the
+    owner's outcome (or the last failed call's; seconds since its request was
+    sent), every provider that was started, and the ones that failed before
+    their first output.
+    """
+    providers = [p for p in (primary, secondary) if p]
+    if hedge_after is None:
+        learned = ProviderStats.for_provider(providers[0][0]).percentile(Config.LLM_HEDGE_PERCENTILE, first_output=True)
+        hedge_after = Config.LLM_HEDGE_DEFAULT_DELAY if learned is None else max(Config.HEDGE_MIN_DELAY, learned)
+
+    race = {"owner": [], "lock": threading.Lock()}
+    running, tickets = {}, {}
+    outcome = {"name": None, "result": None, "error": None, "seconds": 0.0, "launched": [], "failed": []}
+
+    def launch(provider):
+        name, func = provider
+        ticket = tickets[name] = StreamTicket(name, race)
+        outcome['launched'].append(name)
+
+        def run():
+            try:
+                return func(ticket), None
+            except Exception as e:
+                return None, e
+
+        running[_HEDGE_POOL.submit(run)] = name
+
+    launch(providers[0])
+    primary_ticket = tickets[providers[0][0]]
+    backups = providers[1:]
+
+    while running:
+        timeout, waiting_on = None, list(running)
+        if backups and not race['owner']:
+            if primary_ticket.sent_at is None:
+                # Still queued on its rate limits: the hedge timer hasn't started
+                waiting_on.append(primary_ticket._sent)
+            else:
+                timeout = max(0.0, hedge_after - primary_ticket.elapsed())
+        done, _ = wait(waiting_on, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            if not race['owner']:
+                print(f"🏁 {providers[0][0]} silent for {hedge_after:.1f}s. Racing {backups[0][0]}...")
+                ProviderRouter.record(backups[0][0], "hedged")
+                launch(backups.pop(0))
+            continue
+
+        for future in done:
+            if future not in running:
+                continue   # The primary's request went out: re-arm the timer
+            name = running.pop(future)
+            result, error = future.result()
+            if race['owner'] and race['owner'][0] != name:
+                continue   # Lost the race (cancelled)
+            outcome.update(name=name, result=result, error=error, seconds=tickets[name].elapsed())
+            if race['owner']:
+                return outcome
+            # Failed (or answered nothing) before its first output: hand over right away
+            outcome['failed'].append(name)
+            if backups:
+                launch(backups.pop(0))
+
+    return outcome
+
+
+class ProviderRouter:
+    """
+    Decides the order in which interchangeable providers (the Brain's LLMs) are tried,
+    from the ProviderStats they share with hedged_call / raced_stream:
+    - providers whose circuit breaker is open go last;
+    - among the healthy ones, the fastest recent p50 goes first once every one
+      of them has enough samples; until then the configured preference holds.
+    Every decision is counted for metrics().
+    """
+
+    _decisions = {}    # provider -> {decision: count}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def order(names):
+        ranked = []
+        for index, name in enumerate(names):
+            stats = ProviderStats.for_provider(name)
+            ranked.append((stats.breaker.state == "open", stats.percentile(0.5), index, name))
+
+        healthy = [r for r in ranked if not r[0]]
+        by_latency = bool(healthy) and all(r[1] is not None for r in healthy)
+        ranked.sort(key=lambda r: (r[0], r[1] if by_latency and not r[0] else 0.0, r[2]))
+
+        order = [r[3] for r in ranked]
+        if order:
+            ProviderRouter.record(order[0], "routed")
+            for is_open, _, _, name in ranked:
+                if is_open:
+                    ProviderRouter.record(name, "breaker_open")
+        if order and names and order[0] != names[0]:
+            print(f"🧭 Routing to {order[0]} (faster/healthier than {names[0]} right now).")
+        return order
+
+    @staticmethod
+    def record(name, decision):
+        with ProviderRouter._lock:
+            counts = ProviderRouter._decisions.setdefault(name, {})
+            counts[decision] = counts.get(decision, 0) + 1
+
+    @staticmethod
+    def metrics():
+        """{"providers": latency/error/breaker per provider, "decisions": routing counts per provider}."""
+        with ProviderRouter._lock:
+            decisions = {name: dict(counts) for name, counts in ProviderRouter._decisions.items()}
+        return {"providers": ProviderStats.snapshot_all(), "decisions": decisions}
@@ -0,0 +1,205 @@
+import json
+from src.modules.library import LocalLibrary
+
+class BlueprintSchema:
+    """
+    Strict checks and tolerant repair for LLM blueprints.
+    parse()    -> JSON object from a raw reply, surviving fences, trailing text
+                  and truncation (open strings/arrays/objects are cut back and closed).
+    repair()   -> fixes what can be fixed locally (string ids, missing visual.query,
+                  duration_estimate, full_voiceover rebuilt from narrations) and
+                  lists the sections that still need the model (see Brain._complete).
+    validate() -> remaining schema violations (empty list = valid).
+    """
+
+    REQUIRED_SECTIONS = ("script", "scenes")
+    WORDS_PER_SECOND = 2.5          # Narration pace used to estimate missing durations
+    DURATION_RANGE = (1.0, 15.0)
+    MAX_TRUNCATION_CUTS = 64        # Cut points tried (from the end) when closing a truncated reply
+
+    @staticmethod
+    def parse(raw_content):
+        """The reply's root JSON object, or None if nothing usable could be recovered."""
+        if not raw_content:
+            return None
+        start = raw_content.find("{")
+        if start < 0:
+            return None
+        text = raw_content[start:]
+        try:
+            # raw_decode stops at the end of the object: trailing chatter / fences are ignored
+            value, _ = json.JSONDecoder().raw_decode(text)
+            return value if isinstance(value, dict) else None
+        except ValueError:
+            pass
+
+        value = BlueprintSchema._close_truncated(text)
+        if value is not None:
+            print("🩹 Blueprint reply was cut off. Recovered the complete part.")
+        return value
+
+    @staticmethod
+    def _close_truncated(text):
+        """
+        Cuts a truncated object back to its last complete value and closes every
+        open container. Tries the latest cut points first.
+        """
+        stack, cuts = [], []
+        in_string = escape = False
+        for i, c in enumerate(text):
+            if in_string:
+                if escape:
+                    escape = False
+                elif c == '\\':
+                    escape = True
+                elif c == '"':
+                    in_string = False
+                continue
+            if c == '"':
+                in_string = True
+            elif c in '{[':
+                stack.append(c)
+            elif c in '}]':
+                if not stack:
+                    break
+                stack.pop()
+                cuts.append((i + 1, "".join(stack)))
+                if not stack:
+                    break
+            elif c == ',':
+                cuts.append((i, "".join(stack)))
+
+        closers = {'{': '}', '[': ']'}
+        for end, open_stack in reversed(cuts[-BlueprintSchema.MAX_TRUNCATION_CUTS:]):
+            candidate = text[:end] + "".join(closers[c] for c in reversed(open_stack))
+            try:
+                value = json.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                return value
+        return None
+
+    @staticmethod
+    def repair(blueprint):
+        """
+        Fixes blueprint in place. Returns the sections still missing
+        (a subset of REQUIRED_SECTIONS) that only the model can supply.
+        """
+        scenes = blueprint.get('scenes')
+        if not isinstance(scenes, list):
+            scenes = []
+        used_ids = set()
+        scenes = [BlueprintSchema.repair_scene(scene, index, used_ids)
+                  for index, scene in enumerate(s for s in scenes if isinstance(s, dict))]
+        # A scene cut off right after its id has nothing to say or show
+        blueprint['scenes'] = [s for s in scenes if s['narration'] or s['visual'].get('query')]
+
+        script = blueprint.get('script')
+        if not isinstance(script, dict):
+            script = blueprint['script'] = {}
+        if not BlueprintSchema._text(script.get('full_voiceover')):
+            narration = " ".join(s['narration'] for s in blueprint['scenes'] if s['narration'])
+            if narration:
+                print("🩹 Blueprint had no full_voiceover. Rebuilt it from the scene narrations.")
+                script['full_voiceover'] = narration
+
+        for section in ("upload_metadata", "marketing", "branding", "music", "meta"):
+            if not isinstance(blueprint.get(section), dict):
+                blueprint[section] = {}
+
+        missing = []
+        if not BlueprintSchema._text(script.get('full_voiceover')):
+            missing.append("script")
+        if not blueprint['scenes']:
+            missing.append("scenes")
+        return missing
+
+    @staticmethod
+    def repair_scene(scene, index, used_ids):
+        """
+        Normalizes one scene (also used on streamed scenes, so both paths agree on ids).
+        used_ids collects the ids handed out so far.
+        """
+        scene_id = scene.get('id')
+        try:
+            scene_id = int(str(scene_id).strip())
+        except (TypeError, ValueError):
+            scene_id = None
+        if scene_id is None or scene_id in used_ids:
+            scene_id = index + 1
+            while scene_id in used_ids:
+                scene_id += 1
+        used_ids.add(scene_id)
+        scene['id'] = scene_id
+
+        narration = BlueprintSchema._text(scene.get('narration'))
+        scene['narration'] = narration
+
+        visual = scene.get('visual')
+        if isinstance(visual, str):
+            visual = {"query": visual}
+        elif not isinstance(visual, dict):
+            visual = {}
+        if not BlueprintSchema._text(visual.get('query')):
+            # Best guess from what's said on screen
+            words = LocalLibrary.tokenize(narration or scene.get('overlay_text', ''))
+            query = " ".join(words[:4]) or BlueprintSchema._text(visual.get('fallback'))
+            if query:
+                visual['query'] = query
+        scene['visual'] = visual
+
+        scene['duration_estimate'] = BlueprintSchema._duration(scene.get('duration_estimate'), narration)
+        return scene
+
+    @staticmethod
+    def _duration(value, narration):
+        """Seconds as a float within DURATION_RANGE ("3.5s" -> 3.5); estimated from narration if unusable."""
+        low, high = BlueprintSchema.DURATION_RANGE
+        try:
+            seconds = float(str(value).strip().rstrip("sS").strip())
+        except (TypeError, ValueError):
+            seconds = 0.0
+        if not seconds > 0:
+            seconds = BlueprintSchema.speech_seconds(narration)
+        return round(min(high, max(low, seconds)), 2)
+
+    @staticmethod
+    def speech_seconds(text):
+        """Estimated speaking time of text at WORDS_PER_SECOND."""
+        return len(BlueprintSchema._text(text).split()) / BlueprintSchema.WORDS_PER_SECOND
+
+    @staticmethod
+    def _text(value):
+        return value.strip() if isinstance(value, str) else ""
+
+    @staticmethod
+    def validate(blueprint):
+        """Schema violations as readable strings (empty list = valid)."""
+        errors = []
+        if not isinstance(blueprint, dict):
+            return ["blueprint is not a JSON object"]
+        if not BlueprintSchema._text(blueprint.get('script', {}).get('full_voiceover')):
+            errors.append("script.full_voiceover is missing")
+
+        scenes = blueprint.get('scenes')
+        if not isinstance(scenes, list) or not scenes:
+            errors.append("scenes is missing or empty")
+            return errors
+
+        seen = set()
+        for index, scene in enumerate(scenes):
+            where = f"scenes[{index}]"
+            if not isinstance(scene, dict):
+                errors.append(f"{where} is not an object")
+                continue
+            if not isinstance(scene.get('id'), int) or scene['id'] in seen:
+                errors.append(f"{where}.id must be a unique integer")
+            seen.add(scene.get('id'))
+            if not BlueprintSchema._text(scene.get('narration')):
+                errors.append(f"{where}.narration is missing")
+            if not BlueprintSchema._text((scene.get('visual') or {}).get('query')):
+                errors.append(f"{where}.visual.query is missing")
+            if not isinstance(scene.get('duration_estimate'), (int, float)) or scene['duration_estimate'] <= 0:
+                errors.append(f"{where}.duration_estimate must be a positive number")
+        return errors
@@ -1,54 +1,85 @@
-from moviepy.editor import TextClip
+from moviepy.editor import ImageClip
 from src.config import Config
+from src.modules.captions import CaptionRenderer
 
 class SubtitleEngine:
     """
     Generates 'Burned-in' captions for high retention.
     """
     
+    CHUNK_SIZE = 5  # Max 5-6 words per chunk for readability
+
     @staticmethod
-    def generate_subtitle_clips(full_text, total_duration, video_width):
+    def generate_subtitle_clips(full_text, total_duration, video_width, word_timings=None):
         """
         Splits text into chunks and maps them to time segments.
+        With word_timings (from VoiceEngine.synthesize) chunks are placed exactly
+        where the words are spoken; otherwise timing is proportional to length.
         """
-        # 1. Chunk the text (Max 5-6 words per chunk for readability)
+        if word_timings:
+            timed_chunks = SubtitleEngine._chunks_from_timings(word_timings, total_duration)
+        else:
+            timed_chunks = SubtitleEngine._chunks_by_length(full_text, total_duration)
+
+        clips = []
+        print(f"📝 Subtitle Engine: Generating {len(timed_chunks)} text chunks...")
+
+        for chunk, current_time, chunk_duration in timed_chunks:
+            # Rasterize in-process (cached sprite, wrapped at 80% width)
+            try:
+                sprite = CaptionRenderer.render(
+                    chunk.upper(),
+                    font_size=Config.FONT_SIZE,
+                    color=Config.FONT_COLOR,
+                    stroke_color=Config.STROKE_COLOR,
+                    stroke_width=Config.STROKE_WIDTH,
+                    max_width=int(video_width * 0.8)
+                )
+                txt_clip = (ImageClip(sprite, transparent=True)
+                            .set_start(current_time).set_duration(chunk_duration).set_position(('center', 'center')))
+                
+                clips.append(txt_clip)
+            except Exception as e:
+                print(f"⚠️ Caption Error: {e}")
+                # Continue without this subtitle if it fails
+                continue
+            
+        return clips
+
+    @staticmethod
+    def _chunks_by_length(full_text, total_duration):
+        """Fallback: [(text, start, duration)] proportional to character count."""
+        # 1. Chunk the text
         words = full_text.split()
         chunks = []
-        chunk_size = 5
+        chunk_size = SubtitleEngine.CHUNK_SIZE
         
         for i in range(0, len(words), chunk_size):
             chunks.append(" ".join(words[i:i + chunk_size]))
             
         # 2. Calculate timing
         total_chars = len(full_text)
-        clips = []
+        timed_chunks = []
         current_time = 0
-        
-        print(f"📝 Subtitle Engine: Generating {len(chunks)} text chunks...")
 
         for chunk in chunks:
             # Proportional duration logic
             chunk_duration = (len(chunk) / total_chars) * total_duration
-            
-            # Create the TextClip
-            # We use 'method="caption"' to allow auto-wrapping
-            try:
-                txt_clip = TextClip(
-                    chunk.upper(),
-                    fontsize=Config.FONT_SIZE, 
-                    font=Config.FONT_NAME, 
-                    color=Config.FONT_COLOR, 
-                    stroke_color=Config.STROKE_COLOR, 
-                    stroke_width=Config.STROKE_WIDTH,
-                    size=(video_width * 0.8, None), # Wrap at 80% width
-                    method='caption'
-                ).set_start(current_time).set_duration(chunk_duration).set_position(('center', 'center'))
-                
-                clips.append(txt_clip)
-                current_time += chunk_duration
-            except Exception as e:
-                print(f"⚠️ TextClip Error (ImageMagick issue?): {e}")
-                # Continue without this subtitle if it fails
-                continue
-            
-        return clips
\ No newline at end of file
+            timed_chunks.append((chunk, current_time, chunk_duration))
+            current_time += chunk_duration
+        return timed_chunks
+
+    @staticmethod
+    def _chunks_from_timings(word_timings, total_duration):
+        """[(text, start, duration)] from TTS word boundaries (no drift)."""
+        chunk_size = SubtitleEngine.CHUNK_SIZE
+        groups = [word_timings[i:i + chunk_size] for i in range(0, len(word_timings), chunk_size)]
+
+        timed_chunks = []
+        for i, group in enumerate(groups):
+            start = group[0]['start']
+            # Hold each chunk until the next one starts (no flicker in pauses)
+            end = groups[i + 1][0]['start'] if i + 1 < len(groups) else max(group[-1]['end'], total_duration)
+            text = " ".join(w['word'] for w in group)
+            timed_chunks.append((text, start, max(end - start, 0.05)))
+        return timed_chunks
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 import shutil
+import subprocess
 
 def clean_temp_folder(folder_path):
     """Deletes all files in the temp folder to prevent mixing old assets."""
@@ -14,4 +15,42 @@ def clean_temp_folder(folder_path):
             elif os.path.isdir(file_path):
                 shutil.rmtree(file_path)
         except Exception as e:
-            print(f"⚠️ Failed to delete {file_path}. Reason: {e}")
\ No newline at end of file
+            print(f"⚠️ Failed to delete {file_path}. Reason: {e}")
+
+
+def find_music_track(music_dir, music_mood):
+    """Maps a mood ('Chill', 'Phonk'...) to its mp3, falling back to upbeat.mp3."""
+    music_path = os.path.join(music_dir, f"{music_mood.lower()}.mp3")
+    if os.path.exists(music_path):
+        return music_path
+
+    fallback = os.path.join(music_dir, "upbeat.mp3")
+    return fallback if os.path.exists(fallback) else None
+
+
+def get_ffmpeg_binary():
+    """Returns the ffmpeg executable MoviePy is configured to use."""
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return "ffmpeg"
+
+
+def run_ffmpeg(args, label="ffmpeg"):
+    """
+    Runs ffmpeg with the given arguments (without the binary itself).
+    Returns True on success, prints the tail of stderr on failure.
+    """
+    cmd = [get_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error"] + list(args)
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except Exception as e:
+        print(f"⚠️ {label} could not start: {e}")
+        return False
+
+    if result.returncode != 0:
+        err = result.stderr.decode("utf-8", errors="ignore").strip()
+        print(f"⚠️ {label} failed: {err[-500:]}")
+        return False
+    return True
@@ -1,6 +1,10 @@
 import asyncio
 import edge_tts
 import os
+import re
+import threading
+from src.config import Config
+from src.modules.cache import DiskCache, hash_payload, place_file
 
 class VoiceEngine:
     """
@@ -26,38 +30,206 @@ class VoiceEngine:
         "default": "en-US-AriaNeural"
     }
 
+    # Rate: +10% speed makes it sound more like a content creator (less robotic)
+    RATE = "+10%"
+
+    # Edge-TTS default output is CBR "audio-24khz-48kbitrate-mono-mp3",
+    # so duration can be read straight from the byte count
+    OUTPUT_BITRATE = 48000
+
+    # Synthesized audio + word timings, keyed by (normalized text, voice, rate).
+    # Lives outside TEMP_DIR so it survives clean_temp_folder between jobs.
+    _cache = DiskCache(Config.TTS_CACHE_DIR, Config.TTS_CACHE_MAX_MB)
+
+    # One persistent event loop for all synthesis (no loop setup per call)
+    _loop = None
+    _loop_lock = threading.Lock()
+
+    @staticmethod
+    def _run(coro):
+        """Runs a coroutine on the shared event loop (serialized across threads)."""
+        with VoiceEngine._loop_lock:
+            if VoiceEngine._loop is None or VoiceEngine._loop.is_closed():
+                VoiceEngine._loop = asyncio.new_event_loop()
+            return VoiceEngine._loop.run_until_complete(coro)
+
+    @staticmethod
+    def _resolve_voice(voice_name):
+        # If not found (e.g. user selected 'English' generic), default to Nova
+        return VoiceEngine.VOICE_MAP.get(voice_name) or VoiceEngine.VOICE_MAP["default"]
+
+    @staticmethod
+    def _communicate(text: str, voice: str):
+        """Edge-TTS session that reports per-word boundaries."""
+        try:
+            return edge_tts.Communicate(text, voice, rate=VoiceEngine.RATE, boundary="WordBoundary")
+        except TypeError:
+            # edge-tts < 7 has no 'boundary' arg and always emits WordBoundary events
+            return edge_tts.Communicate(text, voice, rate=VoiceEngine.RATE)
+
     @staticmethod
     async def _generate_async(text: str, voice: str, output_path: str):
-        """Internal async generator."""
-        # Rate: +10% speed makes it sound more like a content creator (less robotic)
-        communicate = edge_tts.Communicate(text, voice, rate="+10%")
-        await communicate.save(output_path)
+        """
+        Internal async generator.
+        Streams the audio to disk and collects WordBoundary events in the same pass.
+        Returns [{"word", "start", "end"}] with times in seconds.
+        """
+        communicate = VoiceEngine._communicate(text, voice)
+        word_timings = []
+
+        # The path may be a hard link into the TTS cache: never write through it
+        if os.path.exists(output_path):
+            os.unlink(output_path)
+
+        with open(output_path, "wb") as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+                elif chunk["type"] == "WordBoundary":
+                    # Offsets/durations arrive in 100ns ticks
+                    start = chunk["offset"] / 10_000_000
+                    word_timings.append({
+                        "word": chunk["text"],
+                        "start": start,
+                        "end": start + chunk["duration"] / 10_000_000
+                    })
+
+        return word_timings
+
+    @staticmethod
+    def _cache_key(text: str, voice: str):
+        return hash_payload({"text": text, "voice": voice, "rate": VoiceEngine.RATE,
+                             "bitrate": VoiceEngine.OUTPUT_BITRATE})
+
+    @staticmethod
+    async def _generate_cached(text: str, voice: str, output_path: str):
+        """
+        _generate_async behind the persistent TTS cache.
+        Hits are hard-linked (or copied) into output_path without touching the network.
+        """
+        text = " ".join(text.split())
+        key = VoiceEngine._cache_key(text, voice)
+
+        cached_audio = VoiceEngine._cache.get(key, ".mp3")
+        word_timings = VoiceEngine._cache.get_json(key)
+        if cached_audio and word_timings is not None:
+            place_file(cached_audio, output_path)
+            return word_timings
+
+        word_timings = await VoiceEngine._generate_async(text, voice, output_path)
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            # Audio first: an entry only counts as a hit once its timings exist too
+            if VoiceEngine._cache.put(key, output_path, ".mp3"):
+                VoiceEngine._cache.put_json(key, word_timings)
+        return word_timings
 
     @staticmethod
     def generate_audio(text: str, output_path: str, voice_name: str = "Nova (Female)"):
         """
         Generates TTS audio using the selected voice model.
         """
-        # 1. Lookup the correct voice ID
-        selected_voice = VoiceEngine.VOICE_MAP.get(voice_name)
-        
-        # 2. If not found (e.g. user selected 'English' generic), default to Nova
-        if not selected_voice:
-            selected_voice = VoiceEngine.VOICE_MAP["default"]
+        return VoiceEngine.synthesize(text, output_path, voice_name) is not None
+
+    @staticmethod
+    def _split_sentences(text: str):
+        """Sentences of a script (the unit of the TTS cache in full mode)."""
+        return [part for part in re.split(r'(?<=[.!?…।])\s+', " ".join(text.split())) if part]
+
+    @staticmethod
+    def synthesize(text: str, output_path: str, voice_name: str = "Nova (Female)"):
+        """
+        Generates TTS audio and returns the word timing map captured during synthesis
+        ([{"word", "start", "end"}], seconds), or None on failure.
+        Pass the map to SubtitleEngine for exact caption sync.
+        Synthesized (and cached) sentence by sentence, so editing one sentence
+        only re-synthesizes that sentence.
+        """
+        # Lookup the correct voice ID
+        selected_voice = VoiceEngine._resolve_voice(voice_name)
+        sentences = VoiceEngine._split_sentences(text or "")
+        if not sentences:
+            print("❌ Voice Error: No text to synthesize.")
+            return None
+
+        print(f"🎙️ VOICE ENGINE: Synthesizing {len(text.split())} words ({len(sentences)} sentences) with '{selected_voice}'...")
+        result = VoiceEngine._synthesize_parts(sentences, output_path, selected_voice)
+        return result['word_timings'] if result else None
+
+    @staticmethod
+    def generate_scene_audio(scenes, output_path: str, voice_name: str = "Nova (Female)", max_concurrency=None):
+        """
+        Per-scene mode: synthesizes every scene's 'narration' concurrently (bounded),
+        then joins the parts gaplessly into output_path.
+        Returns {"scene_durations": {scene_id: seconds}, "word_timings": [...]}
+        or None on failure. Scenes without narration get 0 seconds.
+        """
+        selected_voice = VoiceEngine._resolve_voice(voice_name)
+        spoken = [s for s in scenes if (s.get('narration') or '').strip()]
+        if not spoken:
+            print("❌ Voice Error: No scene narration found.")
+            return None
+
+        print(f"🎙️ VOICE ENGINE: Synthesizing {len(spoken)} scenes concurrently with '{selected_voice}'...")
+        result = VoiceEngine._synthesize_parts([s['narration'] for s in spoken], output_path, selected_voice,
+                                               max_concurrency)
+        if not result:
+            return None
+
+        scene_durations = {s['id']: 0.0 for s in scenes}
+        scene_durations.update({s['id']: d for s, d in zip(spoken, result['durations'])})
+        return {"scene_durations": scene_durations, "word_timings": result['word_timings']}
+
+    @staticmethod
+    def _synthesize_parts(texts, output_path: str, voice: str, max_concurrency=None):
+        """
+        Synthesizes every text concurrently (bounded, each behind the TTS cache),
+        then joins the parts gaplessly into output_path.
+        Returns {"durations": [seconds per text], "word_timings": [...]} or None on failure.
+        """
+        limit = max_concurrency or Config.TTS_CONCURRENCY
+        base, ext = os.path.splitext(output_path)
+        part_paths = [f"{base}_part_{i:03d}{ext}" for i in range(len(texts))]
+
+        async def synthesize_all():
+            semaphore = asyncio.Semaphore(limit)
+
+            async def one(text, part_path):
+                async with semaphore:
+                    return await VoiceEngine._generate_cached(text, voice, part_path)
+
+            return await asyncio.gather(*(one(t, p) for t, p in zip(texts, part_paths)))
 
-        print(f"🎙️ VOICE ENGINE: Synthesizing {len(text.split())} words with '{selected_voice}'...")
-        
         try:
-            # Run the async function in a sync wrapper
-            asyncio.run(VoiceEngine._generate_async(text, selected_voice, output_path))
-            
-            if os.path.exists(output_path):
-                # print(f"✅ Audio Saved: {output_path}") # Optional debug
-                return True
-            else:
-                print("❌ Voice Error: File creation failed.")
-                return False
-                
+            part_timings = VoiceEngine._run(synthesize_all())
+            VoiceEngine._cache.prune()
         except Exception as e:
             print(f"❌ Voice Critical Error: {e}")
-            return False
\ No newline at end of file
+            return None
+
+        # Join the MP3 streams back to back and shift each part's word timings
+        durations = []
+        word_timings = []
+        offset = 0.0
+        try:
+            if os.path.exists(output_path):
+                os.unlink(output_path)   # may be a hard link into the TTS cache
+            with open(output_path, "wb") as out:
+                for i, (part_path, timings) in enumerate(zip(part_paths, part_timings)):
+                    with open(part_path, "rb") as part:
+                        data = part.read()
+                    if not data:
+                        raise ValueError(f"empty audio for part {i}")
+                    out.write(data)
+
+                    duration = len(data) * 8 / VoiceEngine.OUTPUT_BITRATE
+                    durations.append(duration)
+                    word_timings.extend(
+                        {"word": w['word'], "start": w['start'] + offset, "end": w['end'] + offset}
+                        for w in timings
+                    )
+                    offset += duration
+        except Exception as e:
+            print(f"❌ Voice Error: {e}")
+            return None
+
+        return {"durations": durations, "word_timings": word_timings}